@@ -0,0 +1,185 @@
+"""Asynchronous validation with State Validators.
+
+Validation functions may be coroutine functions (or return another
+awaitable); these are run concurrently, while plain validation
+functions are called directly. Requires Python 3.5 or later.
+
+"""
+
+import asyncio
+
+from django.core.exceptions import ValidationError
+from django.forms import formsets
+
+from rebar.dix import (
+    ErrorList,
+    error_list,
+)
+from rebar.validators import (
+    _formset_forms,
+    _has_errors,
+    _overrides_errors,
+    _value_getter,
+)
+
+
+# The default number of asynchronous validation functions which may
+# run at once.
+DEFAULT_CONCURRENCY = 10
+
+
+async def async_errors(validator, instance, concurrency=DEFAULT_CONCURRENCY):
+    """Return the errors of validator for instance.
+
+    This is the asynchronous version of ``StateValidator.errors``.
+    Asynchronous validation functions are run concurrently, with at
+    most ``concurrency`` of them running at once (or without a limit if
+    ``concurrency`` is None).
+
+    """
+
+    return await _errors(validator, instance, _semaphore(concurrency))
+
+
+async def async_is_valid(validator, instance,
+                         concurrency=DEFAULT_CONCURRENCY):
+    """Return True if validator raises no errors for instance.
+
+    This is the asynchronous version of ``StateValidator.is_valid``.
+    Plain validation functions are called first, cheapest first, and
+    the asynchronous ones are only started if all of those pass. The
+    remaining asynchronous validation functions are cancelled as soon
+    as one fails.
+
+    """
+
+    return await _is_valid(validator, instance, _semaphore(concurrency))
+
+
+def _semaphore(concurrency):
+
+    if concurrency is not None:
+        return asyncio.Semaphore(concurrency)
+
+
+async def _errors(validator, instance, semaphore):
+
+    # validators which override errors() are validated synchronously
+    if _overrides_errors(validator):
+        return validator.errors(instance)
+
+    if isinstance(instance, formsets.BaseFormSet):
+        return list(await asyncio.gather(*[
+            _errors(validator, form, semaphore)
+            for form in _formset_forms(instance)
+        ]))
+
+    get = _value_getter(instance)
+    if get is None:
+        return None
+
+    if not validator.enabled:
+        return {}
+
+    # a list of (field, errors) for plain validation functions, and
+    # (field, awaitable) for asynchronous ones
+    outcomes = []
+    for field, validators in validator._get_plan():
+        value = get(field)
+        for function in validators:
+            try:
+                outcome = function(value)
+            except ValidationError as e:
+                outcome = error_list(e)
+            else:
+                if _is_awaitable(outcome):
+                    outcome = _await_errors(outcome, semaphore)
+                else:
+                    outcome = None
+
+            outcomes.append((field, outcome))
+
+    awaited = iter(await asyncio.gather(*[
+        outcome for field, outcome in outcomes if _is_awaitable(outcome)
+    ]))
+
+    errors = {}
+    for field, outcome in outcomes:
+        if _is_awaitable(outcome):
+            outcome = next(awaited)
+
+        if outcome:
+            errors.setdefault(field, ErrorList()).extend(outcome)
+
+    return errors
+
+
+async def _is_valid(validator, instance, semaphore):
+
+    if _overrides_errors(validator):
+        return not _has_errors(validator.errors(instance))
+
+    if isinstance(instance, formsets.BaseFormSet):
+        for form in _formset_forms(instance):
+            if not await _is_valid(validator, form, semaphore):
+                return False
+        return True
+
+    get = _value_getter(instance)
+    if get is None or not validator.enabled:
+        return True
+
+    pending = []
+    values = {}
+    for cost, field, function in validator._get_checks():
+        if field not in values:
+            values[field] = get(field)
+
+        try:
+            outcome = function(values[field])
+        except ValidationError:
+            _close(pending)
+            return False
+
+        if _is_awaitable(outcome):
+            pending.append(outcome)
+
+    tasks = [
+        asyncio.ensure_future(_await_errors(outcome, semaphore))
+        for outcome in pending
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            if await task:
+                return False
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return True
+
+
+async def _await_errors(awaitable, semaphore):
+    """Await the outcome of a validation function, returning its errors."""
+
+    try:
+        if semaphore is None:
+            await awaitable
+        else:
+            async with semaphore:
+                await awaitable
+    except ValidationError as e:
+        return error_list(e)
+
+
+def _is_awaitable(outcome):
+
+    return hasattr(outcome, '__await__')
+
+
+def _close(awaitables):
+    """Close awaitables which will not be awaited."""
+
+    for awaitable in awaitables:
+        if hasattr(awaitable, 'close'):
+            awaitable.close()
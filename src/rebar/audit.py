@@ -0,0 +1,155 @@
+"""Tools for validating the state of large querysets."""
+
+import multiprocessing
+
+from django.db import connections
+from django.db.models import Max, Min
+
+
+class AuditSummary(object):
+    """Totals collected while auditing a queryset."""
+
+    def __init__(self):
+
+        self.checked = 0
+        self.invalid = 0
+        # the number of invalid objects with errors for each field
+        self.fields = {}
+
+    def add(self, checked, failures):
+        """Add the results for a batch of ``checked`` objects."""
+
+        self.checked += checked
+        self.invalid += len(failures)
+
+        for pk, errors in failures:
+            for field in errors:
+                self.fields[field] = self.fields.get(field, 0) + 1
+
+
+def audit_queryset(validator, queryset,
+                   processes=None,
+                   range_size=10000,
+                   chunk_size=2000,
+                   on_failure=None,
+                   context=multiprocessing):
+    """Validate queryset with a pool of worker processes.
+
+    The primary keys of queryset are split into ranges of
+    ``range_size``, and each range is validated by a worker process
+    with ``validator.validate_queryset``. Each worker uses its own
+    database connection. Results are merged into an AuditSummary as
+    the workers finish; ``on_failure`` is called with the pk and
+    errors of every invalid object.
+
+    Database connections are closed before the workers are started,
+    so this must not be called inside a transaction. ``context`` is
+    the multiprocessing module or context used to start the pool; with
+    the ``fork`` start method, validator and queryset do not need to
+    be picklable.
+
+    """
+
+    summary = AuditSummary()
+
+    results = _iter_ranges(
+        validator, queryset, processes, range_size, chunk_size, context,
+    )
+    try:
+        for checked, failures in results:
+            summary.add(checked, failures)
+
+            if on_failure is not None:
+                for pk, errors in failures:
+                    on_failure(pk, errors)
+    finally:
+        # stops the workers if on_failure raised an exception
+        results.close()
+
+    return summary
+
+
+def _iter_ranges(validator, queryset, processes, range_size, chunk_size,
+                 context):
+    """Yield (checked, failures) for each pk range, as they finish."""
+
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+
+    ranges = _pk_ranges(bounds['low'], bounds['high'], range_size)
+
+    # workers must not share the connections of this process
+    for connection in connections.all():
+        connection.close()
+
+    pool = context.Pool(
+        processes,
+        initializer=_init_worker,
+        initargs=(
+            validator,
+            queryset.model,
+            queryset.query,
+            queryset.db,
+            chunk_size,
+        ),
+    )
+
+    try:
+        for result in pool.imap_unordered(_validate_range, ranges):
+            yield result
+    except BaseException:
+        # don't wait for the remaining ranges on errors, interrupts,
+        # or when the results are no longer wanted
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def _pk_ranges(low, high, range_size):
+    """Yield [low, high) pk ranges of range_size covering low..high."""
+
+    while low <= high:
+        yield low, min(low + range_size, high + 1)
+        low += range_size
+
+
+_worker_state = {}
+
+
+def _init_worker(validator, model, query, using, chunk_size):
+
+    import django
+    if hasattr(django, 'setup'):
+        # required when workers are spawned rather than forked
+        django.setup()
+
+    queryset = model._default_manager.using(using).all()
+    queryset.query = query
+
+    _worker_state.update(
+        validator=validator,
+        queryset=queryset,
+        chunk_size=chunk_size,
+    )
+
+
+def _validate_range(pk_range):
+
+    low, high = pk_range
+    queryset = _worker_state['queryset'].filter(pk__gte=low, pk__lt=high)
+
+    checked = 0
+    failures = []
+    for pk, errors in _worker_state['validator'].validate_queryset(
+            queryset,
+            chunk_size=_worker_state['chunk_size'],
+            include_valid=True):
+        checked += 1
+        if errors:
+            failures.append((pk, errors))
+
+    return checked, failures
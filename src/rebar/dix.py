@@ -1,6 +1,255 @@
 # Django "Six"
 
+import django
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    from django.forms.util import ErrorDict, ErrorList
+except ImportError:
+    from django.forms.utils import ErrorDict, ErrorList
+
+try:
+    from django.utils.translation import ugettext_lazy as gettext_lazy
+except ImportError:
+    from django.utils.translation import gettext_lazy
+
+try:
+    string_types = (basestring,)
+except NameError:
+    string_types = (str,)
+
+
+try:
+    from time import perf_counter
+except ImportError:
+    from time import time as perf_counter
+
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    import threading
+
+    class ContextVar(object):
+        """Thread local stand-in for contextvars.ContextVar."""
+
+        def __init__(self, name, default=None):
+
+            self.name = name
+            self._default = default
+            self._local = threading.local()
+
+        def get(self):
+
+            return getattr(self._local, 'value', self._default)
+
+        def set(self, value):
+
+            token = self.get()
+            self._local.value = value
+
+            return token
+
+        def reset(self, token):
+
+            self._local.value = token
+
+
+def error_list(error):
+    """Return the individual errors carried by a ValidationError.
+
+    On Django 1.7 and later these are ValidationError instances which
+    keep their message, code and params; messages are only rendered
+    when the ErrorList holding them is displayed. Older versions only
+    provide rendered messages.
+
+    """
+
+    if hasattr(error, 'error_dict'):
+        return [e for errors in error.error_dict.values() for e in errors]
+
+    return getattr(error, 'error_list', error.messages)
+
+
+try:
+    from django.core.cache import caches
+
+    def get_cache(alias):
+        return caches[alias]
+
+except ImportError:
+    from django.core.cache import get_cache
+
+
+try:
+    from django.core.exceptions import FieldDoesNotExist
+except ImportError:
+    from django.db.models.fields import FieldDoesNotExist
+
+
+def queryset_iterator(queryset, chunk_size):
+    """Iterate over queryset, fetching chunk_size rows at a time."""
+
+    if django.VERSION < (4, 1) and queryset._prefetch_related_lookups:
+        # iterator() ignores prefetch_related() before Django 4.1
+        return _sliced_iterator(queryset, chunk_size)
+
+    if django.VERSION >= (2, 0):
+        return queryset.iterator(chunk_size=chunk_size)
+
+    return queryset.iterator()
+
+
+def _sliced_iterator(queryset, chunk_size):
+
+    start = 0
+    while True:
+        chunk = list(queryset[start:start + chunk_size])
+        for obj in chunk:
+            yield obj
+
+        if len(chunk) < chunk_size:
+            return
+        start += chunk_size
+
+
+def is_relation(field):
+
+    if hasattr(field, 'is_relation'):
+        return field.is_relation
+
+    return getattr(field, 'rel', None) is not None
+
+
+def related_model(field):
+
+    if hasattr(field, 'related_model'):
+        return field.related_model
+
+    return field.rel.to
+
+
+def is_to_many(field):
+
+    return bool(
+        getattr(field, 'many_to_many', False) or
+        getattr(field, 'one_to_many', False)
+    )
+
+
 try:
-    from django.forms.util import ErrorList
+    from django.db.models.manager import BaseManager
 except ImportError:
-    from django.forms.utils import ErrorList
+    from django.db.models import Manager as BaseManager
+
+
+try:
+    from django.apps import apps
+
+    def get_model(label):
+        return apps.get_model(label)
+
+except ImportError:
+    from django.db.models import get_model as _get_model
+
+    def get_model(label):
+        """Return the model for an app_label.ModelName label."""
+
+        app_label, model_name = label.split('.')
+        model = _get_model(app_label, model_name)
+        if model is None:
+            raise LookupError("No installed model %s." % (label,))
+
+        return model
+
+
+try:
+    from django.utils.module_loading import import_string
+except ImportError:
+    from importlib import import_module
+
+    def import_string(dotted_path):
+        """Import and return the attribute named by dotted_path."""
+
+        try:
+            module_path, name = dotted_path.rsplit('.', 1)
+        except ValueError:
+            raise ImportError("%s is not a module path." % (dotted_path,))
+
+        module = import_module(module_path)
+        try:
+            return getattr(module, name)
+        except AttributeError:
+            raise ImportError(
+                "%s does not define %s." % (module_path, name),
+            )
+
+
+from django.core.management.base import BaseCommand
+
+if not hasattr(BaseCommand, 'add_arguments'):
+    from optparse import make_option
+
+    from django.core.management.base import CommandError
+
+    _BaseCommand = BaseCommand
+
+    class _ArgumentRecorder(object):
+        """Record add_argument() calls as optparse options."""
+
+        def __init__(self):
+
+            self.positional = []
+            self.options = []
+
+        def add_argument(self, *names, **kwargs):
+
+            if not names[0].startswith('-'):
+                self.positional.append(names[0])
+                return
+
+            if kwargs.get('type') is int:
+                kwargs['type'] = 'int'
+            elif 'choices' in kwargs:
+                kwargs['type'] = 'choice'
+
+            self.options.append(make_option(*names, **kwargs))
+
+    class BaseCommand(_BaseCommand):
+        """BaseCommand declaring its arguments with add_arguments().
+
+        Before Django 1.8, the options are passed to optparse, and the
+        positional arguments are added to the options by name.
+
+        """
+
+        def add_arguments(self, parser):
+            pass
+
+        def _arguments(self):
+
+            recorder = _ArgumentRecorder()
+            self.add_arguments(recorder)
+
+            return recorder
+
+        @property
+        def option_list(self):
+
+            return _BaseCommand.option_list + tuple(self._arguments().options)
+
+        def execute(self, *args, **options):
+
+            positional = self._arguments().positional
+            if len(args) != len(positional):
+                raise CommandError(
+                    "Expected arguments: %s." % (' '.join(positional),),
+                )
+
+            options.update(zip(positional, args))
+
+            return super(BaseCommand, self).execute(**options)
@@ -1,16 +1,43 @@
+import datetime
+import hashlib
+import numbers
+
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms.fields import FileField
 from django.forms.forms import BaseForm
 from django.forms.formsets import BaseFormSet
-from django.forms.models import BaseInlineFormSet
-from rebar.dix import ErrorList
-
-from rebar.validators import StateValidatorFormMixin
+from django.forms.models import (
+    BaseInlineFormSet,
+    BaseModelForm,
+)
+from django.utils.datastructures import MultiValueDict
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+from rebar.dix import (
+    ErrorDict,
+    ErrorList,
+    Mapping,
+    error_list,
+    get_cache,
+    string_types,
+)
+
+from rebar.validators import (
+    StateValidatorFormMixin,
+    _has_errors,
+    validate_states,
+)
 
 
 class Unspecified(object):
     """Unspecified Value."""
 Unspecified = Unspecified()
 
+# Version of the payload returned by FormGroup.get_state(); payloads with
+# a different version are ignored by FormGroup.from_state().
+STATE_VERSION = 1
+
 
 class FormGroup(object):
     """Form-like wrapper for a heterogenous collection of Forms.
@@ -21,6 +48,11 @@ class FormGroup(object):
 
     """
 
+    # The alias of the Django cache used to store the rendered HTML of
+    # unbound members; rendering is not cached if this is None.
+    render_cache = None
+    render_cache_timeout = 300
+
     def __init__(self,
                  data=None,
                  files=None,
@@ -32,6 +64,7 @@ class FormGroup(object):
                  error_class=None,
                  member_kwargs=None):
 
+        self._data_version = 0
         self.is_bound = data is not None or files is not None
         self.data = data or {}
         self.files = files or {}
@@ -42,6 +75,7 @@ class FormGroup(object):
         self.error_class = error_class or ErrorList
         self._errors = None
         self._group_errors = None
+        self._cleaned_data = None
 
         self.prefix = prefix or self.get_default_prefix()
 
@@ -49,6 +83,7 @@ class FormGroup(object):
 
         # instantiate the members
         self._forms = []
+        self._names = []
         self.named_forms = {}
 
         for member_class in self.form_classes:
@@ -92,6 +127,25 @@ class FormGroup(object):
             )
             self.named_forms[name] = new_form
             self._forms.append(new_form)
+            self._names.append(name)
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._data_version += 1
+
+    @property
+    def files(self):
+        return self._files
+
+    @files.setter
+    def files(self, files):
+        self._files = files
+        self._data_version += 1
 
     @property
     def forms(self):
@@ -144,6 +198,8 @@ class FormGroup(object):
     def _full_clean(self):
 
         self._errors = []
+        self._cleaned_data = None
+        self._data_version += 1
         if not self.is_bound:
             return
 
@@ -155,7 +211,7 @@ class FormGroup(object):
         try:
             self.clean()
         except ValidationError as e:
-            self._group_errors = self.error_class(e.messages)
+            self._group_errors = self.error_class(error_list(e))
 
     def clean(self):
         """
@@ -191,6 +247,99 @@ class FormGroup(object):
 
         return self._errors
 
+    @property
+    def cleaned_data(self):
+        """A read-only mapping of the cleaned data of every member.
+
+        Form fields are available as ``<member name>-<field name>``,
+        and the list of cleaned data for a FormSet is available under
+        the member name. Values are looked up in the members'
+        ``cleaned_data`` when accessed, so nothing is copied. Accessing
+        ``cleaned_data`` will trigger validation if it has not been
+        performed yet.
+
+        """
+
+        if self._cleaned_data is None:
+            if self._errors is None:
+                self._full_clean()
+            self._cleaned_data = GroupCleanedData(
+                zip(self._names, self.forms),
+            )
+
+        return self._cleaned_data
+
+    def get_state(self):
+        """Return a compact snapshot of the bound group for storage.
+
+        The snapshot contains the submitted data and, for valid
+        members, the cleaned data, and may be stored in the session
+        (it is JSON serializable). Use ``from_state`` to rebuild the
+        group without validating members whose data has not changed.
+
+        """
+
+        if not self.is_bound:
+            raise ValueError("Only bound FormGroups can be stored.")
+
+        # ensure the members have been validated
+        self.errors
+
+        members = {}
+        for name, member in zip(self._names, self.forms):
+            members[name] = [
+                member.prefix,
+                _member_data(self.data, member.prefix),
+                _encode_cleaned_data(member),
+            ]
+
+        return {
+            'v': STATE_VERSION,
+            'm': members,
+        }
+
+    @classmethod
+    def from_state(cls, state, data=None, files=None, **kwargs):
+        """Return a FormGroup rebuilt from a ``get_state`` snapshot.
+
+        If ``data`` is provided, members with data in it are bound to
+        the new data; other members are bound to the data in
+        ``state``. Members which were valid when the snapshot was taken
+        and whose data is unchanged are marked valid with their stored
+        cleaned data, without being validated again.
+
+        """
+
+        if state.get('v') != STATE_VERSION:
+            state = {'m': {}}
+
+        group_data = MultiValueDict()
+        if data is not None:
+            for key, values in _data_lists(data).items():
+                group_data.setlist(key, values)
+
+        for prefix, member_data, cleaned in state['m'].values():
+            if not any(_has_prefix(key, prefix) for key in group_data):
+                for key, values in member_data.items():
+                    group_data.setlist(key, values)
+
+        group = cls(data=group_data, files=files, **kwargs)
+
+        for name, member in zip(group._names, group.forms):
+            if name not in state['m']:
+                continue
+
+            prefix, member_data, cleaned = state['m'][name]
+            if (cleaned is None or
+                    member.prefix != prefix or
+                    _member_data(group.files, prefix) or
+                    _member_data(group_data, prefix) != member_data):
+                continue
+
+            _restore_cleaned_data(member, cleaned)
+
+        return group
+
     def group_errors(self):
         """
         Return the group level validation errors.
@@ -231,6 +380,90 @@ class FormGroup(object):
 
         return self.instance
 
+    def iter_render(self, method='as_p'):
+        """Yield the HTML for the group, one fragment at a time.
+
+        Each Form is rendered with its ``method`` (ie, ``as_p``,
+        ``as_table``, or ``as_ul``) as a single fragment; FormSets
+        yield their management form followed by one fragment per
+        member form. The result can be passed directly to a
+        StreamingHttpResponse.
+
+        """
+
+        cached = {}
+        keys = [
+            self.get_render_cache_key(name, method)
+            for name in self._names
+        ]
+        if any(keys):
+            cache = get_cache(self.render_cache)
+            cached = cache.get_many([key for key in keys if key])
+
+        for key, member in zip(keys, self.forms):
+            if key is None:
+                for fragment in self._iter_render_member(member, method):
+                    yield fragment
+                continue
+
+            if key not in cached:
+                cached[key] = mark_safe(''.join(
+                    self._iter_render_member(member, method)
+                ))
+                cache.set(key, cached[key], self.render_cache_timeout)
+
+            yield mark_safe(cached[key])
+
+    def _iter_render_member(self, member, method):
+
+        if isinstance(member, BaseFormSet):
+            yield getattr(member.management_form, method)()
+            for form in member.forms:
+                yield getattr(form, method)()
+        else:
+            yield getattr(member, method)()
+
+    def get_render_cache_key(self, name, method):
+        """Return the render cache key for the member ``name``.
+
+        Returns None if the member's HTML should not be cached: if no
+        ``render_cache`` is configured, or if the group is bound or
+        has an instance, since the HTML then depends on more than the
+        group's arguments. The HTML is also not cached if the initial
+        data or the member's keyword arguments contain anything other
+        than plain data (strings, numbers, dates, None, and lists,
+        tuples and dicts of those), which can not be told apart by
+        their repr.
+
+        """
+
+        if (self.render_cache is None or
+                self.is_bound or
+                self.instance is not Unspecified):
+            return None
+
+        member = self.named_forms[name]
+        arguments = (
+            self.auto_id,
+            self.label_suffix,
+            sorted(self.initial.items()),
+            sorted(self.member_kwargs.get(name, {}).items()),
+        )
+        if not _is_plain_data(arguments):
+            return None
+
+        signature = repr((
+            _class_signature(type(member)),
+            member.prefix,
+            method,
+            arguments,
+            get_language(),
+        ))
+
+        return 'rebar.render.%s' % (
+            hashlib.md5(signature.encode('utf-8')).hexdigest(),
+        )
+
     @property
     def media(self):
 
@@ -242,19 +475,135 @@ class FormGroup(object):
         return group_media
 
 
+class GroupCleanedData(Mapping):
+    """Read-only view of the cleaned data of FormGroup members."""
+
+    def __init__(self, members):
+
+        self._members = list(members)
+        self._index = None
+
+    def _get_index(self):
+
+        if self._index is None:
+            self._index = {}
+
+            for name, member in self._members:
+                if isinstance(member, BaseFormSet):
+                    try:
+                        formset_data = {name: member.cleaned_data}
+                    except AttributeError:
+                        continue
+                    self._index[name] = (formset_data, name)
+                    continue
+
+                form_data = getattr(member, 'cleaned_data', {})
+                for field in form_data:
+                    self._index['%s-%s' % (name, field)] = (form_data, field)
+
+        return self._index
+
+    def __getitem__(self, key):
+
+        data, field = self._get_index()[key]
+        return data[field]
+
+    def __iter__(self):
+
+        return iter(self._get_index())
+
+    def __len__(self):
+
+        return len(self._get_index())
+
+
 class StateValidatorFormGroup(StateValidatorFormMixin, FormGroup):
     """
 
     Subclasses are expected to define the state_validators property,
-    which is a mapping of states to StateValidator objects."""
+    which is a mapping of states to StateValidator objects.
+
+    The errors for each state are computed once and reused by later
+    calls to ``is_valid(*states)`` and ``get_errors(*states)``, until
+    the group is validated again, its ``data`` or ``files`` are
+    replaced, or a state is enabled or disabled. Call
+    ``reset_state_errors()`` after modifying the data in place.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        self._state_errors = {}
+        super(StateValidatorFormGroup, self).__init__(*args, **kwargs)
+
+    def reset_state_errors(self):
+        """Discard the memoized errors for every state."""
+
+        self._state_errors = {}
+
+    def _get_state_errors(self, states):
+        """Return a list of (member errors, group errors) for states.
+
+        The states without memoized errors are validated together, so
+        validation functions shared by several states are only called
+        once for each member.
+
+        """
+
+        # clean the group first, so group validators which read its
+        # errors or cleaned data don't leave the memo stale
+        self.errors
+
+        members = [
+            form for form in self.forms
+            if isinstance(form, StateValidatorFormMixin)
+        ]
+
+        missing = [
+            state for state in states
+            if state not in self._state_errors or
+            self._state_errors[state][0] != self._state_version(
+                state, members,
+            )
+        ]
+
+        if missing:
+            member_errors = [
+                form.get_state_errors(*missing) for form in members
+            ]
+            with self._disabled_context():
+                group_errors = validate_states(
+                    dict((state, self.state_validators[state])
+                         for state in missing),
+                    self,
+                )
+
+            for state in missing:
+                self._state_errors[state] = (
+                    self._state_version(state, members),
+                    [errors[state] for errors in member_errors],
+                    group_errors[state],
+                )
+
+        return [self._state_errors[state][1:] for state in states]
+
+    def _state_version(self, state, members):
+
+        return (
+            self._data_version,
+            self.state_enabled(state),
+            tuple(form.state_enabled(state) for form in members),
+        )
 
     def get_errors(self, *states):
 
-        return [form.get_errors(*states)
-                   for form in self.forms
-                   if isinstance(form, StateValidatorFormMixin)] + \
-               [self.state_validators[state].errors(self)
-                   for state in states]
+        results = self._get_state_errors(states)
+
+        return [
+            errors
+            for member_errors, group_errors in results
+            for errors in member_errors
+        ] + [group_errors for member_errors, group_errors in results]
 
     def is_valid(self, *states):
         """Returns True if no errors are thrown for the specified state."""
@@ -264,11 +613,222 @@ class StateValidatorFormGroup(StateValidatorFormMixin, FormGroup):
             return super(StateValidatorFormGroup, self).is_valid()
 
         # see if the states pass for all forms that define state_validators
-        return all(form.is_valid(*states)
-                   for form in self.forms
-                   if isinstance(form, StateValidatorFormMixin)) and \
-               all(self.state_validators[state].is_valid(self)
-                   for state in states)
+        return not any(
+            _has_errors(member_errors) or _has_errors(group_errors)
+            for member_errors, group_errors in self._get_state_errors(states)
+        )
+
+
+def _has_prefix(key, prefix):
+
+    return key.startswith('%s-' % (prefix,))
+
+
+def _data_lists(data):
+    """Return a dict of key to list of values for a data dict or QueryDict."""
+
+    if hasattr(data, 'lists'):
+        return dict(data.lists())
+
+    return dict(
+        (key, list(value) if isinstance(value, (list, tuple)) else [value])
+        for key, value in data.items()
+    )
+
+
+def _member_data(data, prefix):
+
+    return dict(
+        (key, value)
+        for key, value in _data_lists(data).items()
+        if _has_prefix(key, prefix)
+    )
+
+
+def _encode_value(field, value):
+
+    if value is None:
+        return None
+
+    value = field.prepare_value(value)
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(field, v) for v in value]
+
+    if isinstance(value, string_types + (bool, int, float)):
+        return value
+
+    # raises TypeError for values which can not be serialized
+    return DjangoJSONEncoder().default(value)
+
+
+def _encode_form_data(form):
+
+    encoded = {}
+    for field_name, value in form.cleaned_data.items():
+        field = form.fields.get(field_name)
+        if field is None or isinstance(field, FileField):
+            raise TypeError("Can not encode %s" % (field_name,))
+
+        encoded[field_name] = _encode_value(field, value)
+
+        # values coerced by clean() (for example, by a TypedChoiceField)
+        # can not be rebuilt with to_python()
+        try:
+            decoded = _decode_value(field, encoded[field_name])
+        except ValidationError:
+            decoded = Unspecified
+        if decoded != value:
+            raise TypeError("Can not restore %s" % (field_name,))
+
+    return encoded
+
+
+def _encode_cleaned_data(member):
+    """Return the serializable cleaned data for member, or None.
+
+    None is returned if member is invalid, or its cleaned data can not
+    be rebuilt without validation.
+
+    """
+
+    if not member.is_valid():
+        return None
+
+    try:
+        if isinstance(member, BaseFormSet):
+            return [_encode_form_data(form) for form in member.forms]
+
+        return _encode_form_data(member)
+    except TypeError:
+        return None
+
+
+def _decode_value(field, value):
+
+    if value is None:
+        return None
+
+    return field.to_python(value)
+
+
+def _decode_form_data(form, encoded):
+
+    return dict(
+        (field_name, _decode_value(form.fields[field_name], value))
+        for field_name, value in encoded.items()
+    )
+
+
+def _restore_cleaned_data(member, cleaned):
+    """Mark member as valid with the stored cleaned data.
+
+    If the stored data can not be converted back, member is left
+    alone and will be validated as usual. ModelForms still copy the
+    cleaned data to their instance and validate it, as they would
+    after cleaning their fields.
+
+    """
+
+    try:
+        if isinstance(member, BaseFormSet):
+            if len(cleaned) != len(member.forms):
+                return
+            decoded = [
+                _decode_form_data(form, form_data)
+                for form, form_data in zip(member.forms, cleaned)
+            ]
+        else:
+            decoded = _decode_form_data(member, cleaned)
+    except (KeyError, TypeError, ValueError, ValidationError):
+        return
+
+    if isinstance(member, BaseFormSet):
+        for form, form_data in zip(member.forms, decoded):
+            _restore_form(form, form_data)
+        member._errors = [
+            form._errors for form in member.forms
+            if not (member.can_delete and member._should_delete_form(form))
+        ]
+        member._non_form_errors = member.error_class()
+    else:
+        _restore_form(member, decoded)
+
+
+def _restore_form(form, cleaned_data):
+
+    form.cleaned_data = cleaned_data
+    form._errors = ErrorDict()
+
+    # ModelForm._post_clean constructs the instance and runs model
+    # validation; like full_clean, skip it for unchanged extra forms
+    if (isinstance(form, BaseModelForm) and
+            not (form.empty_permitted and not form.has_changed())):
+        form._post_clean()
+
+
+def _is_plain_data(value):
+    """Return True if value is made up of data with a faithful repr."""
+
+    if value is None or isinstance(
+            value,
+            string_types + (
+                numbers.Number,
+                datetime.date,
+                datetime.time,
+                datetime.timedelta,
+            )):
+        return True
+
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain_data(item) for item in value)
+
+    if isinstance(value, dict):
+        return all(
+            _is_plain_data(key) and _is_plain_data(item)
+            for key, item in value.items()
+        )
+
+    return False
+
+
+def _class_signature(member_class):
+    """Return a description of member_class that is stable across processes.
+
+    Classes built by formset_factory and modelform_factory share their
+    names, so the FormSet configuration and the declared fields (with
+    their widgets) are included as well.
+
+    """
+
+    signature = (
+        _class_name(member_class),
+    )
+
+    if hasattr(member_class, 'base_fields'):
+        signature += tuple(
+            (name, _class_name(type(field)), _class_name(type(field.widget)))
+            for name, field in member_class.base_fields.items()
+        )
+
+    if issubclass(member_class, BaseFormSet):
+        signature += (
+            _class_signature(member_class.form),
+            member_class.extra,
+            member_class.can_order,
+            member_class.can_delete,
+            member_class.max_num,
+            getattr(member_class, 'min_num', None),
+        )
+
+    return signature
+
+
+def _class_name(cls):
+
+    return '%s.%s' % (
+        cls.__module__,
+        getattr(cls, '__qualname__', cls.__name__),
+    )
 
 
 def formgroup_factory(form_classes,
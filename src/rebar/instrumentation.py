@@ -0,0 +1,169 @@
+"""Opt-in timing of the validation functions run by State Validators.
+
+When a sink is installed with ``instrument()``, every call of a
+validation function by a State Validator is recorded with the sink,
+keyed on ``(validator class, state, field, validation function)``.
+
+"""
+
+import logging
+import threading
+from collections import deque
+
+
+# The sink receiving measurements, or None when instrumentation is off.
+sink = None
+
+
+def instrument(new_sink=None):
+    """Start recording validation function calls with new_sink.
+
+    A MemorySink is used if no sink is provided. Returns the sink.
+
+    """
+
+    global sink
+
+    if new_sink is None:
+        new_sink = MemorySink()
+
+    sink = new_sink
+    return sink
+
+
+def uninstrument():
+    """Stop recording validation function calls."""
+
+    global sink
+
+    sink = None
+
+
+def describe(key):
+    """Return a readable description of a measurement key."""
+
+    validator_class, state, field, function = key
+
+    return '%s(%s).%s: %s' % (
+        _name(validator_class), state, field, _name(function),
+    )
+
+
+def _name(obj):
+
+    if obj is None:
+        return None
+
+    return getattr(
+        obj, '__qualname__',
+        getattr(obj, '__name__', None) or _name(type(obj)),
+    )
+
+
+class MemorySink(object):
+    """Keep call counts and timings in memory.
+
+    The most recent ``samples`` durations of each key are kept for
+    computing percentiles.
+
+    """
+
+    def __init__(self, samples=1000):
+
+        self.samples = samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard everything recorded so far."""
+
+        with self._lock:
+            # key -> [calls, failures, total seconds, recent durations]
+            self._records = {}
+
+    def record(self, key, elapsed, failed):
+        """Record a call of the validation function identified by key."""
+
+        with self._lock:
+            try:
+                record = self._records[key]
+            except KeyError:
+                record = self._records[key] = [
+                    0, 0, 0.0, deque(maxlen=self.samples),
+                ]
+
+            record[0] += 1
+            record[1] += failed
+            record[2] += elapsed
+            record[3].append(elapsed)
+
+    def stats(self):
+        """Return a dict of key to the statistics for that key.
+
+        The statistics are a dict with the number of ``calls`` and
+        ``failures``, the ``failure_rate``, the ``total`` time, and the
+        ``p50``, ``p90`` and ``p99`` durations, in seconds.
+
+        """
+
+        with self._lock:
+            records = [
+                (key, calls, failures, total, sorted(durations))
+                for key, (calls, failures, total, durations)
+                in self._records.items()
+            ]
+
+        return dict(
+            (key, {
+                'calls': calls,
+                'failures': failures,
+                'failure_rate': float(failures) / calls,
+                'total': total,
+                'p50': _percentile(durations, 50),
+                'p90': _percentile(durations, 90),
+                'p99': _percentile(durations, 99),
+            })
+            for key, calls, failures, total, durations in records
+        )
+
+    def slowest(self, count=10):
+        """Return the (key, stats) of the count keys with the most time."""
+
+        return sorted(
+            self.stats().items(),
+            key=lambda item: item[1]['total'],
+            reverse=True,
+        )[:count]
+
+
+class LoggingSink(object):
+    """Log each call of a validation function."""
+
+    def __init__(self, logger='rebar.instrumentation', level=logging.DEBUG):
+
+        if not isinstance(logger, logging.Logger):
+            logger = logging.getLogger(logger)
+
+        self.logger = logger
+        self.level = level
+
+    def record(self, key, elapsed, failed):
+
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level,
+                "%s %.1fus%s",
+                describe(key),
+                elapsed * 1000000,
+                ' (failed)' if failed else '',
+            )
+
+
+def _percentile(durations, percent):
+    """Return the nearest-rank percentile of sorted durations."""
+
+    if not durations:
+        return None
+
+    rank = int(round(percent / 100.0 * (len(durations) - 1)))
+    return durations[rank]
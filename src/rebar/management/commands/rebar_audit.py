@@ -0,0 +1,196 @@
+import csv
+
+from django.core.management.base import CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from rebar.dix import (
+    BaseCommand,
+    get_model,
+    import_string,
+    perf_counter,
+)
+from rebar.validators import StateValidator
+
+
+class Command(BaseCommand):
+
+    help = ("Validate every object of a model with a StateValidator, "
+            "writing the failures as JSON lines or CSV.")
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            'model',
+            help="The model to audit, as app_label.ModelName.",
+        )
+        parser.add_argument(
+            'validator',
+            help="The import path of the StateValidator class.",
+        )
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'csv'),
+            default='jsonl',
+            help="The output format (default: jsonl).",
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help="The file to write failures to (default: stdout). "
+                 "When resuming, failures are appended to the file.",
+        )
+        parser.add_argument(
+            '--after',
+            help="Resume after the object with this primary key.",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help="The number of objects to load at a time.",
+        )
+        parser.add_argument(
+            '--progress-every',
+            type=int,
+            default=10000,
+            help="Report progress after this many objects (default: "
+                 "10000; 0 disables progress reports).",
+        )
+
+    def handle(self, *args, **options):
+
+        try:
+            model = get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+
+        try:
+            validator = import_string(options['validator'])
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        if isinstance(validator, type) and \
+                issubclass(validator, StateValidator):
+            validator = validator()
+        if not isinstance(validator, StateValidator):
+            raise CommandError(
+                "%s is not a StateValidator." % (options['validator'],),
+            )
+
+        queryset = model._default_manager.order_by('pk')
+        if options['after'] is not None:
+            after = model._meta.pk.to_python(options['after'])
+            queryset = queryset.filter(pk__gt=after)
+
+        if options['output'] == '-':
+            output = None
+            write = self.stdout.write
+        else:
+            output = open(
+                options['output'],
+                'a' if options['after'] is not None else 'w',
+            )
+            write = output.write
+
+        try:
+            writer = _WRITERS[options['format']](
+                write,
+                header=output is None or output.tell() == 0,
+            )
+            checked, invalid = self._audit(
+                validator, queryset, writer, options,
+            )
+        finally:
+            if output is not None:
+                output.close()
+
+        self.stderr.write("Checked %d %s, %d invalid." % (
+            checked, model._meta.verbose_name_plural, invalid,
+        ))
+
+    def _audit(self, validator, queryset, writer, options):
+
+        progress_every = options['progress_every']
+        checked = invalid = 0
+        start = perf_counter()
+
+        for pk, errors in validator.validate_queryset(
+                queryset,
+                chunk_size=options['chunk_size'],
+                include_valid=True):
+            checked += 1
+            if errors:
+                invalid += 1
+                writer(pk, errors)
+
+            if progress_every and checked % progress_every == 0:
+                self.stderr.write(
+                    "Checked %d (%.0f/s), %d invalid; last pk: %s" % (
+                        checked,
+                        checked / (perf_counter() - start),
+                        invalid,
+                        pk,
+                    ),
+                )
+
+        return checked, invalid
+
+
+def _error_data(field_errors):
+    """Return the messages and codes of an ErrorList."""
+
+    return [
+        {'message': message, 'code': error.code}
+        for error in field_errors.as_data()
+        for message in error
+    ]
+
+
+class _JSONLinesWriter(object):
+    """Write each failure as a JSON object on its own line."""
+
+    def __init__(self, write, header=True):
+
+        self.write = write
+        self.encoder = DjangoJSONEncoder(sort_keys=True)
+
+    def __call__(self, pk, errors):
+
+        self.write(self.encoder.encode({
+            'pk': pk,
+            'errors': dict(
+                (field, _error_data(field_errors))
+                for field, field_errors in errors.items()
+            ),
+        }) + '\n')
+
+
+class _CSVWriter(object):
+    """Write a row for each error of each failure."""
+
+    def __init__(self, write, header=True):
+
+        self.writer = csv.writer(_Writable(write), lineterminator='\n')
+        if header:
+            self.writer.writerow(('pk', 'field', 'code', 'message'))
+
+    def __call__(self, pk, errors):
+
+        for field in sorted(errors):
+            for error in _error_data(errors[field]):
+                self.writer.writerow(
+                    (pk, field, error['code'] or '', error['message']),
+                )
+
+
+class _Writable(object):
+
+    def __init__(self, write):
+
+        self.write = write
+
+
+_WRITERS = {
+    'jsonl': _JSONLinesWriter,
+    'csv': _CSVWriter,
+}
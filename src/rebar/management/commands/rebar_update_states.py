@@ -0,0 +1,49 @@
+from django.core.management.base import CommandError
+
+from rebar.dix import (
+    BaseCommand,
+    get_model,
+)
+from rebar.tracking import get_tracker
+
+
+class Command(BaseCommand):
+
+    help = ("Recompute the state mask column kept by a StateTracker, "
+            "for backfilling or repairing it.")
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            'model',
+            help="The model to update, as app_label.ModelName.",
+        )
+        parser.add_argument(
+            '--field',
+            default='states',
+            help="The name of the state mask field (default: states).",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help="The number of objects to load at a time.",
+        )
+
+    def handle(self, *args, **options):
+
+        try:
+            model = get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+
+        try:
+            tracker = get_tracker(model, options['field'])
+        except LookupError as e:
+            raise CommandError(str(e))
+
+        updated = tracker.update(chunk_size=options['chunk_size'])
+
+        self.stdout.write("Updated %d %s." % (
+            updated, model._meta.verbose_name_plural,
+        ))
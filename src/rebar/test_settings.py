@@ -45,6 +45,11 @@ DATABASES = {
         'PASSWORD': '',                  # Not used with sqlite3.
         'HOST': '',                      # Set to empty string for localhost. Not used with sqlite3.
         'PORT': '',                      # Set to empty string for default. Not used with sqlite3.
+        # Use a file for the test database, so worker processes in the
+        # audit tests can connect to it.
+        'TEST': {
+            'NAME': 'rebar-testing.sqlite3',
+        },
     }
 }
 
@@ -143,6 +148,8 @@ INSTALLED_APPS = (
     'django.contrib.sites',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rebar',
+    'rebar.tests',
     # Uncomment the next line to enable the admin:
     # 'django.contrib.admin',
     # Uncomment the next line to enable admin documentation:
@@ -0,0 +1,143 @@
+"""Tests for asynchronous state validation.
+
+These use ``async def`` and ``asyncio.run``, and are imported by
+test_aio on versions of Python which support them.
+
+"""
+
+import asyncio
+from unittest import TestCase
+
+from django.core.exceptions import ValidationError
+from django.forms.formsets import formset_factory
+
+from rebar.aio import (
+    async_errors,
+    async_is_valid,
+)
+from rebar.tests.helpers import NameForm
+from rebar.validators import statevalidator_factory
+
+
+def required(value):
+    if not bool(value):
+        raise ValidationError("This field is required", code='required')
+
+
+class AsyncValidationTests(TestCase):
+
+    def setUp(self):
+
+        self.running = 0
+        self.max_running = 0
+        self.calls = []
+
+        async def exists(value):
+            self.calls.append(value)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            await asyncio.sleep(0)
+            self.running -= 1
+
+            if value != 'known':
+                raise ValidationError("Unknown", code='unknown')
+
+        self.exists = exists
+        self.Validator = statevalidator_factory({
+            'first_name': (required, exists),
+            'last_name': (exists,),
+        })
+
+    def test_errors(self):
+
+        errors = asyncio.run(async_errors(
+            self.Validator(),
+            {'first_name': '', 'last_name': 'known'},
+        ))
+
+        self.assertEqual(
+            errors,
+            {'first_name': ['This field is required', 'Unknown']},
+        )
+
+    def test_errors_run_concurrently(self):
+
+        asyncio.run(self.Validator().aerrors(
+            {'first_name': 'a', 'last_name': 'b'},
+        ))
+
+        self.assertEqual(self.max_running, 2)
+
+    def test_concurrency_limit(self):
+
+        asyncio.run(async_errors(
+            self.Validator(),
+            {'first_name': 'a', 'last_name': 'b'},
+            concurrency=1,
+        ))
+
+        self.assertEqual(self.max_running, 1)
+
+    def test_disabled(self):
+
+        validator = self.Validator()
+        validator.disable()
+
+        self.assertEqual(asyncio.run(validator.aerrors({})), {})
+        self.assertTrue(asyncio.run(validator.ais_valid({})))
+
+    def test_is_valid(self):
+
+        self.assertTrue(asyncio.run(async_is_valid(
+            self.Validator(),
+            {'first_name': 'known', 'last_name': 'known'},
+        )))
+        self.assertFalse(asyncio.run(async_is_valid(
+            self.Validator(),
+            {'first_name': 'known', 'last_name': 'other'},
+        )))
+
+    def test_is_valid_skips_async_validators_when_plain_ones_fail(self):
+
+        self.assertFalse(asyncio.run(self.Validator().ais_valid({})))
+        self.assertEqual(self.calls, [])
+
+    def test_formset(self):
+
+        NameFormSet = formset_factory(NameForm, extra=0)
+        formset = NameFormSet(
+            initial=[
+                {'first_name': 'known', 'last_name': 'known'},
+                {'first_name': 'known'},
+            ],
+        )
+
+        self.assertEqual(
+            asyncio.run(self.Validator().aerrors(formset)),
+            [{}, {'last_name': ['Unknown']}],
+        )
+        self.assertFalse(asyncio.run(self.Validator().ais_valid(formset)))
+
+    def test_overridden_errors_used(self):
+
+        class NamedValidator(self.Validator):
+
+            def errors(self, instance):
+                if not instance.get('name'):
+                    return {'name': ['Missing']}
+                return {}
+
+        self.assertEqual(
+            asyncio.run(NamedValidator().aerrors({})),
+            {'name': ['Missing']},
+        )
+        self.assertFalse(asyncio.run(NamedValidator().ais_valid({})))
+        self.assertTrue(asyncio.run(NamedValidator().ais_valid(
+            {'name': 'Joe'},
+        )))
+        self.assertEqual(self.calls, [])
+
+    def test_sync_validation_rejects_async_validators(self):
+
+        with self.assertRaises(TypeError):
+            self.Validator().errors({'first_name': 'known'})
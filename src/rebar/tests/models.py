@@ -0,0 +1,54 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+
+from rebar.tracking import (
+    StateMaskField,
+    StateTracker,
+)
+
+
+class Venue(models.Model):
+
+    address = models.CharField(max_length=100, blank=True)
+
+
+class Event(models.Model):
+
+    name = models.CharField(max_length=100, blank=True)
+    summary = models.TextField(blank=True)
+    capacity = models.IntegerField(null=True, blank=True)
+    venue = models.ForeignKey(
+        Venue, null=True, blank=True, on_delete=models.SET_NULL,
+    )
+
+    @property
+    def is_large(self):
+        return (self.capacity or 0) > 1000
+
+
+class TicketClass(models.Model):
+
+    event = models.ForeignKey(
+        Event, related_name='ticket_classes', on_delete=models.CASCADE,
+    )
+    price = models.IntegerField(null=True, blank=True)
+
+
+class TrackedEvent(models.Model):
+
+    name = models.CharField(max_length=100, blank=True)
+    capacity = models.IntegerField(null=True, blank=True)
+    states = StateMaskField()
+
+
+def _required(value):
+    if not value:
+        raise ValidationError("This field is required.")
+
+
+event_states = StateTracker(
+    (
+        ('draft', {'name': (_required,)}),
+        ('published', {'name': (_required,), 'capacity': (_required,)}),
+    ),
+).connect(TrackedEvent)
@@ -0,0 +1,6 @@
+"""Tests for asynchronous state validation."""
+
+import sys
+
+if sys.version_info >= (3, 7):
+    from rebar.tests.aio_cases import AsyncValidationTests  # noqa
@@ -0,0 +1,280 @@
+"""Tests for parallel queryset audits."""
+
+import json
+import multiprocessing
+import os
+import tempfile
+from io import StringIO
+from unittest import skipIf
+
+from django import test
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import ValidationError
+from django.db import connection
+from mock import (
+    Mock,
+    patch,
+)
+
+from rebar.audit import (
+    AuditSummary,
+    _pk_ranges,
+    audit_queryset,
+)
+from rebar.tests.models import Event
+from rebar.validators import statevalidator_factory
+
+
+def required(value):
+    if not bool(value):
+        raise ValidationError("This field is required", code='required')
+
+
+EventValidator = statevalidator_factory({
+    'name': (required,),
+    'capacity': (required,),
+})
+
+
+class AuditSummaryTests(test.SimpleTestCase):
+
+    def test_add_counts_failures_by_field(self):
+
+        summary = AuditSummary()
+        summary.add(3, [(1, {'name': ['Required']})])
+        summary.add(2, [
+            (4, {'name': ['Required'], 'capacity': ['Required']}),
+        ])
+
+        self.assertEqual(summary.checked, 5)
+        self.assertEqual(summary.invalid, 2)
+        self.assertEqual(summary.fields, {'name': 2, 'capacity': 1})
+
+
+@skipIf(
+    connection.vendor == 'sqlite' and
+    not connection.settings_dict.get('TEST', {}).get('NAME'),
+    "Worker processes can not share an in-memory test database.",
+)
+class AuditQuerysetTests(test.TransactionTestCase):
+
+    def setUp(self):
+
+        for i in range(10):
+            Event.objects.create(
+                name='Event %s' % (i,) if i % 2 else '',
+                capacity=i,
+            )
+
+    def test_audit_queryset_in_workers(self):
+
+        failures = {}
+        summary = audit_queryset(
+            EventValidator(),
+            Event.objects.all(),
+            processes=2,
+            range_size=3,
+            on_failure=failures.__setitem__,
+            context=multiprocessing.get_context('fork'),
+        )
+
+        self.assertEqual(summary.checked, 10)
+        self.assertEqual(summary.invalid, 5)
+        self.assertEqual(summary.fields, {'name': 5, 'capacity': 1})
+
+        first = Event.objects.get(capacity=0)
+        self.assertEqual(
+            [e.code for e in failures[first.pk]['capacity'].as_data()],
+            ['required'],
+        )
+
+    def test_audit_filtered_queryset(self):
+
+        summary = audit_queryset(
+            EventValidator(),
+            Event.objects.filter(capacity__gte=5),
+            processes=2,
+            range_size=4,
+            context=multiprocessing.get_context('fork'),
+        )
+
+        self.assertEqual(summary.checked, 5)
+        self.assertEqual(summary.invalid, 2)
+
+    def test_audit_empty_queryset(self):
+
+        summary = audit_queryset(
+            EventValidator(),
+            Event.objects.none(),
+        )
+
+        self.assertEqual(summary.checked, 0)
+
+
+class AuditPoolTests(test.TestCase):
+
+    def setUp(self):
+
+        self.events = [
+            Event.objects.create(name='', capacity=i) for i in range(3)
+        ]
+
+        self.pool = Mock()
+        self.pool.imap_unordered.side_effect = (
+            lambda function, ranges: (
+                (1, [(low, {'name': ['Required']})]) for low, high in ranges
+            )
+        )
+        self.context = Mock()
+        self.context.Pool.return_value = self.pool
+
+        # there are no workers to protect the test database from
+        patcher = patch('rebar.audit.connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pool_closed_when_finished(self):
+
+        summary = audit_queryset(
+            EventValidator(),
+            Event.objects.all(),
+            range_size=1,
+            context=self.context,
+        )
+
+        self.assertEqual(summary.checked, 3)
+        self.assertTrue(self.pool.close.called)
+        self.assertFalse(self.pool.terminate.called)
+        self.assertTrue(self.pool.join.called)
+
+    def test_pool_terminated_on_error(self):
+
+        def on_failure(pk, errors):
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            audit_queryset(
+                EventValidator(),
+                Event.objects.all(),
+                range_size=1,
+                on_failure=on_failure,
+                context=self.context,
+            )
+
+        self.assertTrue(self.pool.terminate.called)
+        self.assertFalse(self.pool.close.called)
+
+    def test_ranges_are_generated_lazily(self):
+
+        ranges = _pk_ranges(1, 10 ** 12, 10)
+
+        self.assertEqual(next(ranges), (1, 11))
+        self.assertEqual(next(ranges), (11, 21))
+        self.assertEqual(list(_pk_ranges(1, 5, 2)), [(1, 3), (3, 5), (5, 6)])
+
+
+class AuditCommandTests(test.TestCase):
+
+    def setUp(self):
+
+        self.events = [
+            Event.objects.create(
+                name='Event %s' % (i,) if i % 2 else '',
+                capacity=i,
+            )
+            for i in range(5)
+        ]
+
+    def audit(self, *args, **options):
+
+        stdout = StringIO()
+        stderr = StringIO()
+        call_command(
+            'rebar_audit',
+            'tests.Event',
+            'rebar.tests.test_audit.EventValidator',
+            *args,
+            stdout=stdout,
+            stderr=stderr,
+            **options
+        )
+
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_jsonl_output(self):
+
+        output, progress = self.audit()
+        failures = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual(
+            [failure['pk'] for failure in failures],
+            [self.events[0].pk, self.events[2].pk, self.events[4].pk],
+        )
+        self.assertEqual(
+            failures[0]['errors'],
+            {
+                'name': [
+                    {'message': 'This field is required', 'code': 'required'},
+                ],
+                'capacity': [
+                    {'message': 'This field is required', 'code': 'required'},
+                ],
+            },
+        )
+        self.assertTrue('Checked 5 events, 3 invalid.' in progress)
+
+    def test_csv_output(self):
+
+        output, progress = self.audit(format='csv')
+
+        self.assertEqual(
+            output.splitlines()[:3],
+            [
+                'pk,field,code,message',
+                '%s,capacity,required,This field is required' % (
+                    self.events[0].pk,
+                ),
+                '%s,name,required,This field is required' % (
+                    self.events[0].pk,
+                ),
+            ],
+        )
+
+    def test_resume_after_pk(self):
+
+        output, progress = self.audit(after=str(self.events[2].pk))
+
+        self.assertEqual(
+            [json.loads(line)['pk'] for line in output.splitlines()],
+            [self.events[4].pk],
+        )
+        self.assertTrue('Checked 2 events' in progress)
+
+    def test_progress(self):
+
+        output, progress = self.audit(progress_every=2)
+
+        self.assertTrue(
+            'last pk: %s' % (self.events[3].pk,) in progress,
+        )
+
+    def test_resume_appends_to_output_file(self):
+
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+
+        self.audit(format='csv', output=path)
+        self.audit(format='csv', output=path, after=str(self.events[2].pk))
+
+        with open(path) as output:
+            lines = output.read().splitlines()
+
+        self.assertEqual(lines.count('pk,field,code,message'), 1)
+        self.assertEqual(len(lines), 1 + 4 + 1)
+
+    def test_validator_must_be_a_state_validator(self):
+
+        with self.assertRaises(CommandError):
+            call_command('rebar_audit', 'tests.Event', 'rebar.tests.models')
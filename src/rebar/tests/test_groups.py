@@ -2,13 +2,19 @@
 Tests for FormGroups
 """
 
+import datetime
+import decimal
+import json
 from unittest import TestCase
 
+from django import forms, test
 from django.core.exceptions import ValidationError
+from django.utils import translation
 from django.forms.formsets import (
     BaseFormSet,
     formset_factory,
 )
+from django.forms.models import modelform_factory
 
 from mock import (
     ANY,
@@ -21,12 +27,21 @@ from rebar.tests.helpers import (
     FakeModel,
     NameForm,
 )
+from rebar.tests.models import Event
 
-from rebar.dix import ErrorList
+from rebar.dix import (
+    ErrorList,
+    get_cache,
+)
 from rebar.group import (
     formgroup_factory,
     FormGroup,
     StateValidatorFormGroup,
+    STATE_VERSION,
+)
+from rebar.validators import (
+    StateValidator,
+    StateValidatorFormMixin,
 )
 
 
@@ -293,6 +308,208 @@ class FormGroupMediaTests(TestCase):
         )
 
 
+class FormGroupRenderingTests(TestCase):
+
+    def test_iter_render_yields_fragment_per_form(self):
+
+        form_group = ContactFormGroup()
+        fragments = list(form_group.iter_render())
+
+        self.assertEqual(
+            fragments,
+            [form_group.name.as_p(), form_group.email.as_p()],
+        )
+
+    def test_iter_render_uses_render_method(self):
+
+        form_group = ContactFormGroup()
+
+        self.assertEqual(
+            list(form_group.iter_render('as_table')),
+            [form_group.name.as_table(), form_group.email.as_table()],
+        )
+
+    def test_iter_render_yields_formset_forms_separately(self):
+
+        form_group = MultiEmailFormGroup()
+        formset = form_group.email
+        fragments = list(form_group.iter_render())
+
+        self.assertEqual(len(fragments), 1 + len(formset.forms) + 1)
+        self.assertEqual(fragments[0], formset.management_form.as_p())
+        self.assertEqual(fragments[1], formset.forms[0].as_p())
+        self.assertEqual(fragments[-1], form_group.name.as_p())
+
+    def test_iter_render_is_lazy(self):
+
+        form_group = ContactFormGroup()
+
+        with patch.object(EmailForm, 'as_p') as as_p:
+            fragments = form_group.iter_render()
+            next(fragments)
+            self.assertFalse(as_p.called)
+
+            next(fragments)
+            self.assertTrue(as_p.called)
+
+
+class FormGroupRenderCacheTests(TestCase):
+
+    def setUp(self):
+
+        get_cache('default').clear()
+
+        self.CachedFormGroup = formgroup_factory(
+            (
+                NameForm,
+                EmailForm,
+            ),
+        )
+        self.CachedFormGroup.render_cache = 'default'
+
+    def test_render_cache_disabled_by_default(self):
+
+        form_group = ContactFormGroup()
+
+        self.assertEqual(
+            form_group.get_render_cache_key('name', 'as_p'),
+            None,
+        )
+
+    def test_cached_render_matches_uncached_render(self):
+
+        self.assertEqual(
+            list(self.CachedFormGroup().iter_render()),
+            list(ContactFormGroup().iter_render()),
+        )
+
+    def test_unbound_members_rendered_once(self):
+
+        list(self.CachedFormGroup().iter_render())
+
+        with patch.object(EmailForm, 'as_p') as as_p:
+            list(self.CachedFormGroup().iter_render())
+
+        self.assertFalse(as_p.called)
+
+    def test_bound_groups_not_cached(self):
+
+        form_group = self.CachedFormGroup(data={})
+
+        self.assertEqual(
+            form_group.get_render_cache_key('name', 'as_p'),
+            None,
+        )
+
+    def test_groups_with_instance_not_cached(self):
+
+        form_group = self.CachedFormGroup(instance=FakeModel())
+
+        self.assertEqual(
+            form_group.get_render_cache_key('name', 'as_p'),
+            None,
+        )
+
+    def test_cache_key_depends_on_arguments(self):
+
+        key = self.CachedFormGroup().get_render_cache_key('name', 'as_p')
+
+        self.assertNotEqual(
+            key,
+            self.CachedFormGroup().get_render_cache_key('email', 'as_p'),
+        )
+        self.assertNotEqual(
+            key,
+            self.CachedFormGroup().get_render_cache_key('name', 'as_ul'),
+        )
+        self.assertNotEqual(
+            key,
+            self.CachedFormGroup(
+                prefix='other',
+            ).get_render_cache_key('name', 'as_p'),
+        )
+        self.assertNotEqual(
+            key,
+            self.CachedFormGroup(
+                initial={'first_name': 'Joe'},
+            ).get_render_cache_key('name', 'as_p'),
+        )
+        self.assertNotEqual(
+            key,
+            self.CachedFormGroup(
+                auto_id='%s',
+            ).get_render_cache_key('name', 'as_p'),
+        )
+
+        with translation.override('de'):
+            self.assertNotEqual(
+                key,
+                self.CachedFormGroup().get_render_cache_key('name', 'as_p'),
+            )
+
+    def test_formset_configuration_in_cache_key(self):
+
+        OneEmail = formgroup_factory(
+            ((formset_factory(EmailForm, extra=1), 'email'),),
+        )
+        TwoEmails = formgroup_factory(
+            ((formset_factory(EmailForm, extra=2), 'email'),),
+        )
+        OneEmail.render_cache = TwoEmails.render_cache = 'default'
+
+        self.assertNotEqual(
+            OneEmail().get_render_cache_key('email', 'as_p'),
+            TwoEmails().get_render_cache_key('email', 'as_p'),
+        )
+
+    def test_object_arguments_not_cached(self):
+
+        class Owner(object):
+
+            def __str__(self):
+                return ' (owner):'
+
+        self.assertIsNone(
+            self.CachedFormGroup(
+                member_kwargs={'name': {'label_suffix': Owner()}},
+            ).get_render_cache_key('name', 'as_p'),
+        )
+        self.assertIsNone(
+            self.CachedFormGroup(
+                initial={'first_name': Owner()},
+            ).get_render_cache_key('name', 'as_p'),
+        )
+        self.assertIsNotNone(
+            self.CachedFormGroup(
+                initial={
+                    'first_name': 'Joe',
+                    'dates': [datetime.date.today(), None],
+                },
+                member_kwargs={'name': {'label_suffix': '?'}},
+            ).get_render_cache_key('name', 'as_p'),
+        )
+
+    def test_model_form_fields_in_cache_key(self):
+
+        NameFormGroup = formgroup_factory(
+            ((modelform_factory(Event, fields=['name']), 'event'),),
+        )
+        CapacityFormGroup = formgroup_factory(
+            ((modelform_factory(Event, fields=['capacity']), 'event'),),
+        )
+        NameFormGroup.render_cache = CapacityFormGroup.render_cache = 'default'
+
+        self.assertNotEqual(
+            NameFormGroup().get_render_cache_key('event', 'as_p'),
+            CapacityFormGroup().get_render_cache_key('event', 'as_p'),
+        )
+
+        name_html = ''.join(NameFormGroup().iter_render())
+        capacity_html = ''.join(CapacityFormGroup().iter_render())
+        self.assertTrue('capacity' in capacity_html)
+        self.assertFalse('capacity' in name_html)
+
+
 class FormGroupInitialTests(TestCase):
 
     def test_pass_initial_data_to_form_members(self):
@@ -468,6 +685,21 @@ class FormGroupValidationTests(TestCase):
             ['Test Exception'],
         )
 
+    @patch.object(FormGroup, 'clean')
+    def test_group_errors_keep_error_codes(self, clean_mock):
+
+        clean_mock.side_effect = ValidationError(
+            'Need %(count)s emails', code='min_emails', params={'count': 2},
+        )
+
+        form_group = ContactFormGroup(data={})
+        self.assertFalse(form_group.is_valid())
+
+        error = form_group.group_errors().as_data()[0]
+        self.assertEqual(error.code, 'min_emails')
+        self.assertEqual(error.params, {'count': 2})
+        self.assertEqual(form_group.group_errors(), ['Need 2 emails'])
+
     def test_group_errors_is_empty_error_list_when_valid(self):
 
         form_data = {
@@ -509,6 +741,383 @@ class FormGroupValidationTests(TestCase):
         self.assertEqual(form_group.name.clean_count, 1)
 
 
+class FormGroupCleanedDataTests(TestCase):
+
+    form_data = {
+        'group-name-first_name': 'John',
+        'group-name-last_name': 'Doe',
+        'group-email-email': 'john.doe@example.com',
+    }
+
+    def test_cleaned_data_namespaces_member_fields(self):
+
+        form_group = ContactFormGroup(data=self.form_data)
+        self.assertTrue(form_group.is_valid())
+
+        self.assertEqual(
+            dict(form_group.cleaned_data),
+            {
+                'name-first_name': 'John',
+                'name-last_name': 'Doe',
+                'email-email': 'john.doe@example.com',
+            },
+        )
+
+    def test_cleaned_data_triggers_validation(self):
+
+        form_group = ContactFormGroup(data=self.form_data)
+
+        self.assertEqual(form_group.cleaned_data['name-last_name'], 'Doe')
+
+    def test_cleaned_data_reads_member_cleaned_data(self):
+
+        form_group = ContactFormGroup(data=self.form_data)
+        self.assertTrue(form_group.is_valid())
+
+        form_group.name.cleaned_data['last_name'] = 'Smith'
+        self.assertEqual(form_group.cleaned_data['name-last_name'], 'Smith')
+
+    def test_cleaned_data_is_read_only(self):
+
+        form_group = ContactFormGroup(data=self.form_data)
+
+        with self.assertRaises(TypeError):
+            form_group.cleaned_data['name-last_name'] = 'Smith'
+
+    def test_cleaned_data_computed_once(self):
+
+        form_group = ContactFormGroup(data=self.form_data)
+
+        self.assertIs(form_group.cleaned_data, form_group.cleaned_data)
+
+    def test_cleaned_data_excludes_invalid_fields(self):
+
+        form_group = ContactFormGroup(
+            data={
+                'group-name-first_name': 'John',
+            },
+        )
+        self.assertFalse(form_group.is_valid())
+
+        self.assertEqual(
+            dict(form_group.cleaned_data),
+            {'name-first_name': 'John'},
+        )
+
+    def test_unbound_cleaned_data_is_empty(self):
+
+        self.assertEqual(dict(ContactFormGroup().cleaned_data), {})
+
+    def test_formset_cleaned_data_under_member_name(self):
+
+        form_data = flatten_to_dict(MultiEmailFormGroup())
+        form_data.update({
+            'group-name-first_name': 'John',
+            'group-name-last_name': 'Doe',
+            'group-email-0-email': 'john.doe@example.com',
+        })
+        form_group = MultiEmailFormGroup(data=form_data)
+        self.assertTrue(form_group.is_valid())
+
+        self.assertEqual(
+            form_group.cleaned_data['email'],
+            form_group.email.cleaned_data,
+        )
+        self.assertEqual(
+            form_group.cleaned_data['email'][0],
+            {'email': 'john.doe@example.com'},
+        )
+
+
+class FormGroupStateTests(TestCase):
+
+    form_data = {
+        'group-name-first_name': 'John',
+        'group-name-last_name': 'Doe',
+        'group-email-email': 'john.doe@example.com',
+    }
+
+    def _stored_state(self, form_group):
+
+        # round trip through JSON, like the session serializer
+        return json.loads(json.dumps(form_group.get_state()))
+
+    def test_unbound_group_state_raises_error(self):
+
+        with self.assertRaises(ValueError):
+            ContactFormGroup().get_state()
+
+    def test_restored_group_is_valid_without_cleaning(self):
+
+        state = self._stored_state(ContactFormGroup(data=self.form_data))
+
+        form_group = ContactFormGroup.from_state(state)
+
+        self.assertTrue(form_group.is_valid())
+        self.assertEqual(form_group.name.clean_count, 0)
+        self.assertEqual(form_group.email.clean_count, 0)
+        self.assertEqual(
+            form_group.cleaned_data['email-email'],
+            'john.doe@example.com',
+        )
+
+    def test_restored_group_bound_to_stored_data(self):
+
+        state = self._stored_state(ContactFormGroup(data=self.form_data))
+
+        form_group = ContactFormGroup.from_state(state)
+
+        self.assertTrue(form_group.is_bound)
+        self.assertEqual(form_group.name['first_name'].value(), 'John')
+
+    def test_changed_members_are_validated(self):
+
+        state = self._stored_state(ContactFormGroup(data=self.form_data))
+
+        form_group = ContactFormGroup.from_state(
+            state,
+            data={'group-email-email': 'not an email'},
+        )
+
+        self.assertFalse(form_group.is_valid())
+        self.assertEqual(form_group.name.clean_count, 0)
+        self.assertTrue(form_group.email.errors)
+        self.assertEqual(form_group.name['last_name'].value(), 'Doe')
+
+    def test_invalid_members_are_validated(self):
+
+        form_data = self.form_data.copy()
+        del form_data['group-name-last_name']
+        state = self._stored_state(ContactFormGroup(data=form_data))
+
+        form_group = ContactFormGroup.from_state(state)
+
+        self.assertFalse(form_group.is_valid())
+        self.assertEqual(form_group.name.clean_count, 1)
+        self.assertEqual(form_group.email.clean_count, 0)
+
+    def test_unknown_state_version_ignored(self):
+
+        state = self._stored_state(ContactFormGroup(data=self.form_data))
+        state['v'] = STATE_VERSION + 1
+
+        form_group = ContactFormGroup.from_state(state, data={})
+
+        self.assertFalse(form_group.is_valid())
+
+    def test_cleaned_values_restored_to_python_values(self):
+
+        class EventForm(forms.Form):
+            start = forms.DateField()
+            capacity = forms.IntegerField(required=False)
+            price = forms.DecimalField()
+
+        EventFormGroup = formgroup_factory(((EventForm, 'event'),))
+        state = self._stored_state(
+            EventFormGroup(
+                data={
+                    'group-event-start': '2014-05-01',
+                    'group-event-capacity': '',
+                    'group-event-price': '10.50',
+                },
+            ),
+        )
+
+        form_group = EventFormGroup.from_state(state)
+
+        self.assertTrue(form_group.is_valid())
+        self.assertEqual(
+            form_group.event.cleaned_data,
+            {
+                'start': datetime.date(2014, 5, 1),
+                'capacity': None,
+                'price': decimal.Decimal('10.50'),
+            },
+        )
+
+    def test_coerced_values_are_validated_again(self):
+
+        class TicketForm(forms.Form):
+            quantity = forms.TypedChoiceField(
+                choices=((1, 'One'), (2, 'Two')),
+                coerce=int,
+            )
+
+        TicketFormGroup = formgroup_factory(((TicketForm, 'ticket'),))
+        state = self._stored_state(
+            TicketFormGroup(data={'group-ticket-quantity': '1'}),
+        )
+
+        form_group = TicketFormGroup.from_state(state)
+
+        self.assertTrue(form_group.is_valid())
+        self.assertEqual(form_group.ticket.cleaned_data, {'quantity': 1})
+
+    def test_formset_members_restored(self):
+
+        form_data = flatten_to_dict(MultiEmailFormGroup())
+        form_data.update({
+            'group-name-first_name': 'John',
+            'group-name-last_name': 'Doe',
+            'group-email-0-email': 'john.doe@example.com',
+        })
+        state = self._stored_state(MultiEmailFormGroup(data=form_data))
+
+        form_group = MultiEmailFormGroup.from_state(state)
+
+        self.assertTrue(form_group.is_valid())
+        self.assertEqual(form_group.email.forms[0].clean_count, 0)
+        self.assertEqual(
+            form_group.email.cleaned_data[0],
+            {'email': 'john.doe@example.com'},
+        )
+
+
+class FormGroupModelStateTests(test.TestCase):
+
+    def test_restored_model_form_updates_instance(self):
+
+        EventFormGroup = formgroup_factory(
+            ((modelform_factory(Event, fields=['name', 'capacity']),
+              'event'),),
+        )
+        state = json.loads(json.dumps(EventFormGroup(
+            data={
+                'group-event-name': 'Launch',
+                'group-event-capacity': '100',
+            },
+        ).get_state()))
+
+        form_group = EventFormGroup.from_state(state, instance=Event())
+
+        self.assertTrue(form_group.is_valid())
+        form_group.event.save()
+
+        event = Event.objects.get()
+        self.assertEqual(event.name, 'Launch')
+        self.assertEqual(event.capacity, 100)
+
+
+class StateValidatorFormGroupTests(TestCase):
+
+    def setUp(self):
+
+        def counting_required(value):
+            counting_required.num_calls += 1
+            if not value:
+                raise ValidationError('Required', code='required')
+        counting_required.num_calls = 0
+        self.counting_required = counting_required
+
+        StateNameForm = type(
+            'StateNameForm',
+            (StateValidatorFormMixin, NameForm),
+            {
+                'state_validators': {
+                    'published': {'last_name': (counting_required,)},
+                },
+            },
+        )
+        self.StateFormGroup = formgroup_factory(
+            ((StateNameForm, 'name'),),
+            state_validators={
+                'published': {},
+            },
+        )
+
+    def test_state_errors_memoized(self):
+
+        form_group = self.StateFormGroup(initial={'first_name': 'Joe'})
+
+        self.assertFalse(form_group.is_valid('published'))
+        self.assertFalse(form_group.is_valid('published'))
+        self.assertEqual(
+            form_group.get_errors('published')[0],
+            {'last_name': ['Required']},
+        )
+        self.assertEqual(self.counting_required.num_calls, 1)
+
+    def test_states_validated_in_one_pass(self):
+
+        StateNameForm = type(
+            'StateNameForm',
+            (StateValidatorFormMixin, NameForm),
+            {
+                'state_validators': {
+                    'draft': {'last_name': (self.counting_required,)},
+                    'published': {'last_name': (self.counting_required,)},
+                },
+            },
+        )
+        form_group = formgroup_factory(
+            ((StateNameForm, 'name'),),
+            state_validators={
+                'draft': {},
+                'published': {},
+            },
+        )(
+            data={
+                'group-name-first_name': 'Joe',
+                'group-name-last_name': 'Smith',
+            },
+        )
+
+        self.assertTrue(form_group.is_valid('draft', 'published'))
+        self.assertEqual(self.counting_required.num_calls, 1)
+
+    def test_group_validators_reading_errors_memoized(self):
+
+        class MembersValidator(StateValidator):
+
+            def errors(self, form_group):
+                form_group.cleaned_data
+                return {}
+
+        form_group = type(
+            'CheckedFormGroup',
+            (self.StateFormGroup,),
+            {'state_validators': {'published': MembersValidator}},
+        )(
+            data={
+                'group-name-first_name': 'Joe',
+                'group-name-last_name': 'Smith',
+            },
+        )
+
+        self.assertTrue(form_group.is_valid('published'))
+        self.assertTrue(form_group.is_valid('published'))
+        self.assertEqual(self.counting_required.num_calls, 1)
+
+    def test_memoized_errors_reset_by_validation(self):
+
+        form_group = self.StateFormGroup(
+            data={
+                'group-name-first_name': 'Joe',
+                'group-name-last_name': 'Smith',
+            },
+        )
+
+        self.assertTrue(form_group.is_valid('published'))
+        form_group.name.cleaned_data['last_name'] = ''
+        self.assertTrue(form_group.is_valid('published'))
+
+        form_group.is_valid()
+        self.assertFalse(form_group.is_valid('published'))
+
+        form_group.name.cleaned_data['last_name'] = 'Smith'
+        form_group.reset_state_errors()
+        self.assertTrue(form_group.is_valid('published'))
+
+    def test_memoized_errors_reset_when_disabled(self):
+
+        form_group = self.StateFormGroup(initial={'first_name': 'Joe'})
+
+        self.assertFalse(form_group.is_valid('published'))
+        form_group.name.disable_state('published')
+
+        self.assertTrue(form_group.is_valid('published'))
+
+
 class MemberArgsTests(TestCase):
 
     def test_pass_extra_kwargs(self):
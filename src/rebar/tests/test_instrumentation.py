@@ -0,0 +1,128 @@
+"""Tests for validation function instrumentation."""
+
+from unittest import TestCase
+
+from django.core.exceptions import ValidationError
+
+from rebar import instrumentation
+from rebar.instrumentation import (
+    LoggingSink,
+    MemorySink,
+    describe,
+    instrument,
+    uninstrument,
+)
+from rebar.validators import (
+    Required,
+    StateValidatorFormMixin,
+    statevalidator_factory,
+    states_valid,
+)
+from rebar.tests.helpers import NameForm
+
+
+def required(value):
+    if not bool(value):
+        raise ValidationError("This field is required", code='required')
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+
+        self.addCleanup(uninstrument)
+        self.sink = instrument()
+
+        self.Validator = statevalidator_factory({
+            'first_name': (required,),
+        })
+
+    def test_disabled_by_default(self):
+
+        uninstrument()
+
+        self.assertIsNone(instrumentation.sink)
+        self.Validator().errors({})
+
+        self.assertEqual(self.sink.stats(), {})
+
+    def test_records_calls_and_failures(self):
+
+        validator = self.Validator()
+        validator.errors({})
+        validator.errors({'first_name': 'Joe'})
+        validator.is_valid({})
+
+        stats = self.sink.stats()[
+            (self.Validator, None, 'first_name', required)
+        ]
+
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['failures'], 2)
+        self.assertAlmostEqual(stats['failure_rate'], 2 / 3.0)
+        self.assertTrue(stats['total'] >= stats['p99'] >= stats['p50'])
+
+    def test_keys_include_state(self):
+
+        class StateNameForm(StateValidatorFormMixin, NameForm):
+            state_validators = {
+                'published': {'last_name': (required,)},
+            }
+
+        form = StateNameForm()
+        form.is_valid('published')
+        form.get_errors('published')
+
+        [key] = self.sink.stats()
+        self.assertEqual(key[1:], ('published', 'last_name', required))
+        self.assertEqual(self.sink.stats()[key]['calls'], 2)
+
+    def test_states_valid_records_owner(self):
+
+        validators = {'draft': self.Validator()}
+        states_valid(validators, {})
+
+        self.assertEqual(
+            list(self.sink.stats()),
+            [(self.Validator, None, 'first_name', required)],
+        )
+
+    def test_samples_are_bounded(self):
+
+        sink = MemorySink(samples=2)
+        for elapsed in (3, 1, 2):
+            sink.record('key', elapsed, False)
+
+        stats = sink.stats()['key']
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['total'], 6)
+        self.assertEqual(stats['p50'], 1)
+        self.assertEqual(stats['p99'], 2)
+
+    def test_slowest(self):
+
+        self.sink.record('fast', 1, False)
+        self.sink.record('slow', 5, False)
+
+        self.assertEqual(
+            [key for key, stats in self.sink.slowest(1)],
+            ['slow'],
+        )
+
+    def test_logging_sink(self):
+
+        instrument(LoggingSink())
+
+        with self.assertLogs('rebar.instrumentation', 'DEBUG') as logs:
+            self.Validator().errors({})
+
+        [output] = logs.output
+        self.assertTrue('.first_name: required ' in output)
+        self.assertTrue(output.endswith('(failed)'))
+
+    def test_describe(self):
+
+        self.assertEqual(
+            describe((self.Validator, 'draft', 'name', Required())),
+            'StateValidator(draft).name: Required',
+        )
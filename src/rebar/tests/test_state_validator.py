@@ -1,15 +1,43 @@
 """StateValidator Test Suite"""
 
-from unittest import TestCase
+import threading
+from collections import OrderedDict
+from unittest import TestCase, skipIf
+from django.core import validators
 from django.core.exceptions import ValidationError
+from django import test
+from django.forms.formsets import formset_factory
+from mock import patch
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from rebar.group import formgroup_factory
+from rebar.tests.models import (
+    Event,
+    TicketClass,
+    Venue,
+)
 from rebar.tests.helpers import (
     NameForm,
 )
 
 from rebar.validators import (
+    Each,
+    OneOf,
+    Required,
+    StateLadder,
     StateValidator,
+    StateValidatorFormMixin,
+    field_index,
+    revalidate_states,
+    states_valid,
     statevalidator_factory,
+    validate_states,
+    validator_cost,
+    _validator_class,
 )
 
 
@@ -95,6 +123,145 @@ class StateValidatorTests(TestCase):
         self.assertEqual(list(errors.keys()), ['name'])
         self.assert_(isinstance(errors['name'], list))
 
+    def test_errors_keep_codes_and_params(self):
+
+        def max_length(value):
+            if len(value or '') > 3:
+                raise ValidationError(
+                    "At most %(limit)s characters",
+                    code='max_length',
+                    params={'limit': 3},
+                )
+
+        TestValidator = statevalidator_factory({
+            'name': (required, max_length),
+        })
+
+        errors = TestValidator().errors({'name': 'Frobnicate'})
+        self.assertEqual(
+            [(e.code, e.params) for e in errors['name'].as_data()],
+            [('max_length', {'limit': 3})],
+        )
+
+        # messages are rendered when the errors are accessed
+        self.assertEqual(errors['name'], ['At most 3 characters'])
+
+    def test_compile_returns_plan(self):
+
+        TestValidator = statevalidator_factory({
+            'name': [required],
+        })
+
+        self.assertEqual(TestValidator.compile(), (('name', (required,)),))
+
+    def test_compile_cached_per_class(self):
+
+        TestValidator = statevalidator_factory({
+            'name': (required,),
+        })
+
+        self.assertIs(TestValidator.compile(), TestValidator.compile())
+
+        OtherValidator = statevalidator_factory({
+            'address': (required,),
+        }, validator=TestValidator)
+
+        self.assertEqual(
+            OtherValidator.compile(),
+            (('address', (required,)),),
+        )
+
+    def test_replacing_validators_recompiles(self):
+
+        TestValidator = statevalidator_factory({
+            'name': (required,),
+        })
+        validator = TestValidator()
+        self.assertFalse(validator.is_valid({}))
+
+        TestValidator.validators = {}
+        self.assertTrue(validator.is_valid({}))
+
+    def test_instance_validators_used(self):
+
+        validator = statevalidator_factory({
+            'name': (required,),
+        })()
+        validator.validators = {'address': (required,)}
+
+        self.assertEqual(list(validator.errors({}).keys()), ['address'])
+
+    def test_disabled_is_local_to_the_thread(self):
+
+        validator = statevalidator_factory({
+            'name': (required,),
+        })()
+        other_thread = []
+
+        with validator.disabled():
+            self.assertTrue(validator.is_valid({}))
+
+            thread = threading.Thread(
+                target=lambda: other_thread.append(validator.is_valid({})),
+            )
+            thread.start()
+            thread.join()
+
+        self.assertEqual(other_thread, [False])
+        self.assertFalse(validator.is_valid({}))
+
+    def test_disable_is_local_to_the_thread(self):
+
+        validator = statevalidator_factory({
+            'name': (required,),
+        })()
+        other_thread = []
+
+        def disable():
+            validator.disable()
+            other_thread.append(validator.is_valid({}))
+
+        thread = threading.Thread(target=disable)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(other_thread, [True])
+        self.assertTrue(validator.enabled)
+        self.assertFalse(validator.is_valid({}))
+
+    def test_enabled_without_calling_init(self):
+
+        class CustomValidator(StateValidator):
+            validators = {'name': (required,)}
+
+            def __init__(self):
+                pass
+
+        validator = CustomValidator()
+
+        self.assertTrue(validator.enabled)
+        validator.disable()
+        self.assertFalse(validator.enabled)
+        self.assertTrue(validator.is_valid({}))
+        validator.enable()
+        self.assertTrue(validator.enabled)
+
+    def test_validator_validates_mappings(self):
+
+        TestValidator = statevalidator_factory({
+            'name-last_name': (required,),
+        })
+        validator = TestValidator()
+
+        form_group = formgroup_factory((NameForm,))(
+            data={
+                'group-name-first_name': 'Joe',
+                'group-name-last_name': 'Smith',
+            },
+        )
+
+        self.assertTrue(validator.is_valid(form_group.cleaned_data))
+
     def test_validator_validates_form_cleaned_data(self):
 
         TestValidator = statevalidator_factory({
@@ -160,3 +327,1215 @@ class StateValidatorTests(TestCase):
                 ],
             },
         )
+
+
+class ValidatorClassCacheTests(TestCase):
+
+    def test_factory_shares_compiled_plan(self):
+
+        first = statevalidator_factory({'name': (required,)})
+        second = statevalidator_factory({'name': [required]})
+
+        self.assertIs(first, second)
+        self.assertIs(first.compile(), second.compile())
+        self.assertIsNot(
+            first,
+            statevalidator_factory({'name': (required, required)}),
+        )
+
+    def test_factory_keeps_field_order(self):
+
+        first = statevalidator_factory(
+            OrderedDict([('a', (required,)), ('b', (required,))]),
+        )
+        second = statevalidator_factory(
+            OrderedDict([('b', (required,)), ('a', (required,))]),
+        )
+
+        self.assertEqual(first().fields(), ('a', 'b'))
+        self.assertEqual(second().fields(), ('b', 'a'))
+
+    def test_costs_measured_on_instance_not_shared(self):
+
+        measured = statevalidator_factory({'name': (required,)})()
+        measured.measure_costs([{'name': 'Joe'}])
+
+        self.assertTrue(measured.costs)
+        self.assertTrue(measured.is_valid({'name': 'Joe'}))
+        self.assertIsNone(
+            statevalidator_factory({'name': (required,)}).costs,
+        )
+        self.assertIsNone(
+            statevalidator_factory({'name': (required,)})().costs,
+        )
+
+    def test_factory_base_class_is_part_of_key(self):
+
+        class BaseValidator(StateValidator):
+            pass
+
+        validator_class = statevalidator_factory(
+            {'name': (required,)}, validator=BaseValidator,
+        )
+
+        self.assertTrue(issubclass(validator_class, BaseValidator))
+        self.assertFalse(issubclass(
+            statevalidator_factory({'name': (required,)}),
+            BaseValidator,
+        ))
+
+    def test_unhashable_validators_cached_by_identity(self):
+
+        spec = {'name': (validators.MaxLengthValidator(5),)}
+
+        self.assertIs(
+            _validator_class('StateValidator', StateValidator, spec),
+            _validator_class('StateValidator', StateValidator, spec),
+        )
+        self.assertIsNot(
+            _validator_class('StateValidator', StateValidator, spec),
+            _validator_class('StateValidator', StateValidator, dict(spec)),
+        )
+
+    def test_changed_classes_not_reused(self):
+
+        spec = {'name': (Required(),)}
+        validator_class = _validator_class(
+            'StateValidator', StateValidator, spec,
+        )
+        validator_class.validators = {}
+
+        self.assertIsNot(
+            _validator_class('StateValidator', StateValidator, spec),
+            validator_class,
+        )
+
+    def test_cache_is_bounded(self):
+
+        with patch('rebar.validators.CLASS_CACHE_SIZE', 2):
+            first = statevalidator_factory({'first': (required,)})
+            statevalidator_factory({'second': (required,)})
+            statevalidator_factory({'third': (required,)})
+
+            self.assertIsNot(
+                statevalidator_factory({'first': (required,)}),
+                first,
+            )
+
+
+class FormsetValidationTests(TestCase):
+
+    def setUp(self):
+
+        self.validator = statevalidator_factory({
+            'last_name': (required,),
+        })()
+        self.NameFormSet = formset_factory(NameForm, extra=1, can_delete=True)
+        self.formset = self.NameFormSet(
+            data={
+                'form-TOTAL_FORMS': '3',
+                'form-INITIAL_FORMS': '2',
+                'form-0-first_name': 'Joe',
+                'initial-form-0-first_name': 'Joe',
+                'form-0-last_name': 'Smith',
+                'form-1-first_name': 'Jane',
+                'initial-form-1-first_name': 'Jane',
+                'form-1-DELETE': 'on',
+                'initial-form-2-first_name': 'Larry',
+                'form-2-first_name': 'Larry',
+            },
+        )
+        self.formset.is_valid()
+
+    def test_skips_deleted_and_unchanged_forms(self):
+
+        self.assertEqual(self.validator.errors(self.formset), [{}])
+        self.assertTrue(self.validator.is_valid(self.formset))
+
+    def test_forms_to_validate_computed_once(self):
+
+        self.validator.errors(self.formset)
+
+        with patch.object(
+                self.NameFormSet, '_should_delete_form') as should_delete:
+            self.validator.errors(self.formset)
+            self.validator.is_valid(self.formset)
+
+        self.assertFalse(should_delete.called)
+
+    def test_forms_recomputed_after_clean(self):
+
+        self.validator.errors(self.formset)
+        self.formset.full_clean()
+
+        with patch.object(
+                self.NameFormSet, '_should_delete_form',
+                return_value=False) as should_delete:
+            self.assertEqual(
+                self.validator.errors(self.formset),
+                [{}, {'last_name': ['This field is required']}],
+            )
+
+        self.assertTrue(should_delete.called)
+
+    def test_executor(self):
+
+        class RecordingExecutor(object):
+            def map(self, function, *iterables):
+                self.called = True
+                return map(function, *iterables)
+
+        executor = RecordingExecutor()
+
+        self.assertEqual(
+            self.validator.formset_errors(self.formset, executor=executor),
+            [{}],
+        )
+        self.assertTrue(executor.called)
+
+
+class ColumnValidationTests(TestCase):
+
+    def setUp(self):
+
+        self.validator = statevalidator_factory({
+            'name': (Required(), validators.MaxLengthValidator(5)),
+            'capacity': (validators.MinValueValidator(1),),
+            'status': (OneOf(['ready', 'live']),),
+            'code': (validators.RegexValidator('^[A-Z]+$'), required),
+        })()
+
+    def test_fields(self):
+
+        self.assertEqual(
+            self.validator.fields(),
+            ('name', 'capacity', 'status', 'code'),
+        )
+
+    def test_row_masks(self):
+
+        masks = self.validator.validate_columns({
+            'name': ['Party', '', 'Conference'],
+            'capacity': [10, 0, 10],
+            'status': ['ready', 'live', 'draft'],
+            'code': ['ABC', 'ABC', 'abc'],
+        })
+
+        self.assertEqual(masks, [0, 0b11, 0b1101])
+
+    def test_masks_match_errors(self):
+
+        columns = {
+            'name': ['Party', '', 'Conference'],
+            'capacity': [10, 0, 10],
+            'status': ['ready', 'live', 'draft'],
+            'code': ['ABC', '', 'abc'],
+        }
+
+        masks = self.validator.validate_columns(columns)
+
+        fields = self.validator.fields()
+        for row, mask in enumerate(masks):
+            errors = self.validator.errors(
+                dict((field, columns[field][row]) for field in columns),
+            )
+            self.assertEqual(
+                sorted(errors),
+                sorted(
+                    field for bit, field in enumerate(fields)
+                    if mask & (1 << bit)
+                ),
+            )
+
+    def test_columns_must_have_same_length(self):
+
+        with self.assertRaises(ValueError):
+            self.validator.validate_columns({
+                'name': ['Party'],
+                'capacity': [],
+            })
+
+    def test_disabled(self):
+
+        self.validator.disable()
+
+        self.assertEqual(
+            self.validator.validate_columns({'name': ['', '']}),
+            [0, 0],
+        )
+
+    @skipIf(numpy is None, "NumPy is not installed.")
+    def test_numpy_columns(self):
+
+        masks = self.validator.validate_columns({
+            'name': numpy.array(['Party', '', 'Conference']),
+            'capacity': numpy.array([10, 0, 10]),
+            'status': numpy.array(['ready', 'live', 'draft']),
+            'code': numpy.array(['ABC', 'ABC', 'abc'], dtype=object),
+        })
+
+        self.assertIsInstance(masks, numpy.ndarray)
+        self.assertEqual(list(masks), [0, 0b11, 0b1101])
+
+
+class ValidateStatesTests(TestCase):
+
+    def setUp(self):
+
+        def counting_required(value):
+            counting_required.num_calls += 1
+            required(value)
+        counting_required.num_calls = 0
+        self.counting_required = counting_required
+
+        self.validators = {
+            'draft': statevalidator_factory({
+                'first_name': (counting_required,),
+            })(),
+            'published': statevalidator_factory({
+                'first_name': (counting_required,),
+                'last_name': (required,),
+            })(),
+        }
+
+    def test_returns_errors_per_state(self):
+
+        errors = validate_states(self.validators, {'first_name': 'Joe'})
+
+        self.assertEqual(errors['draft'], {})
+        self.assertEqual(
+            errors['published'],
+            {'last_name': ['This field is required']},
+        )
+
+    def test_overridden_errors_used(self):
+
+        class MembersValidator(StateValidator):
+
+            def errors(self, instance):
+                return {'members': ['At least one member is required']}
+
+        class MembersForm(StateValidatorFormMixin, NameForm):
+            state_validators = {'grouped': MembersValidator}
+
+        form = MembersForm(data={'first_name': 'Joe'})
+
+        self.assertEqual(
+            form.get_state_errors('grouped'),
+            {'grouped': form.get_errors('grouped')},
+        )
+        self.assertEqual(
+            validate_states(
+                dict(self.validators, grouped=MembersValidator()),
+                {'first_name': 'Joe'},
+            )['grouped'],
+            {'members': ['At least one member is required']},
+        )
+
+    def test_shared_validators_called_once(self):
+
+        errors = validate_states(self.validators, {})
+
+        self.assertEqual(self.counting_required.num_calls, 1)
+        self.assertEqual(
+            errors['draft'],
+            {'first_name': ['This field is required']},
+        )
+        self.assertEqual(
+            errors['published'],
+            {
+                'first_name': ['This field is required'],
+                'last_name': ['This field is required'],
+            },
+        )
+
+    def test_same_validator_on_other_fields_called_again(self):
+
+        validators = {
+            'draft': statevalidator_factory({
+                'first_name': (self.counting_required,),
+            })(),
+            'published': statevalidator_factory({
+                'last_name': (self.counting_required,),
+            })(),
+        }
+
+        validate_states(validators, {})
+
+        self.assertEqual(self.counting_required.num_calls, 2)
+
+    def test_disabled_states_have_no_errors(self):
+
+        self.validators['published'].disable()
+
+        errors = validate_states(self.validators, {})
+
+        self.assertEqual(errors['published'], {})
+        self.assertTrue(errors['draft'])
+
+    def test_formset_errors_per_state(self):
+
+        NameFormSet = formset_factory(NameForm, extra=0)
+        formset = NameFormSet(
+            initial=[
+                {'first_name': 'Joe', 'last_name': 'Smith'},
+                {'first_name': 'Jane'},
+            ],
+        )
+
+        errors = validate_states(self.validators, formset)
+
+        self.assertEqual(errors['draft'], [{}, {}])
+        self.assertEqual(
+            errors['published'],
+            [{}, {'last_name': ['This field is required']}],
+        )
+
+
+class FailFastTests(TestCase):
+
+    def setUp(self):
+
+        def counting_required(value):
+            counting_required.num_calls += 1
+            required(value)
+        counting_required.num_calls = 0
+        self.counting_required = counting_required
+
+        self.validator = statevalidator_factory({
+            'first_name': (counting_required, counting_required),
+            'last_name': (counting_required,),
+        })()
+
+    def test_is_valid_stops_at_first_failure(self):
+
+        self.assertFalse(self.validator.is_valid({}))
+        self.assertEqual(self.counting_required.num_calls, 1)
+
+    def test_is_valid_runs_every_validator_when_valid(self):
+
+        self.assertTrue(self.validator.is_valid(
+            {'first_name': 'Joe', 'last_name': 'Smith'},
+        ))
+        self.assertEqual(self.counting_required.num_calls, 3)
+
+    def test_is_valid_stops_at_first_invalid_form_in_formset(self):
+
+        NameFormSet = formset_factory(NameForm, extra=0)
+        formset = NameFormSet(
+            initial=[{'first_name': ''}, {'first_name': ''}],
+        )
+
+        self.assertFalse(self.validator.is_valid(formset))
+        self.assertEqual(self.counting_required.num_calls, 1)
+
+    def test_is_valid_model(self):
+
+        validator = statevalidator_factory({
+            'name': (self.counting_required,),
+            'capacity': (self.counting_required,),
+        })()
+
+        self.assertFalse(validator.is_valid(Event()))
+        self.assertTrue(validator.is_valid(Event(name='Party', capacity=5)))
+
+    def test_states_valid_shares_results(self):
+
+        validators = {
+            'draft': statevalidator_factory({
+                'first_name': (self.counting_required,),
+            })(),
+            'published': statevalidator_factory({
+                'first_name': (self.counting_required,),
+                'last_name': (required,),
+            })(),
+        }
+
+        self.assertFalse(states_valid(validators, {'first_name': 'Joe'}))
+        self.assertEqual(self.counting_required.num_calls, 1)
+        self.assertTrue(states_valid(
+            validators, {'first_name': 'Joe', 'last_name': 'Smith'},
+        ))
+
+    def test_overridden_errors_decide_validity(self):
+
+        class GroupValidator(StateValidator):
+
+            def errors(self, instance):
+                if not instance.get('members'):
+                    return {'members': ['At least one member is required']}
+                return {}
+
+        validator = GroupValidator()
+
+        self.assertFalse(validator.is_valid({}))
+        self.assertTrue(validator.is_valid({'members': ['Joe']}))
+        self.assertFalse(states_valid(
+            {'draft': self.validator, 'group': validator},
+            {'first_name': 'Joe', 'last_name': 'Smith'},
+        ))
+        self.assertEqual(
+            StateLadder((('group', validator),)).satisfied({}),
+            0,
+        )
+
+
+class CostOrderingTests(TestCase):
+
+    def setUp(self):
+
+        self.calls = []
+
+        def expensive(value):
+            self.calls.append('expensive')
+            required(value)
+        expensive.cost = 1000
+
+        def cheap(value):
+            self.calls.append('cheap')
+            required(value)
+        cheap.cost = 1
+
+        self.expensive = expensive
+        self.cheap = cheap
+
+    def test_declared_costs(self):
+
+        self.assertEqual(validator_cost(self.cheap), 1)
+        self.assertEqual(validator_cost(Required()), 1)
+        self.assertEqual(validator_cost(validators.MaxLengthValidator(5)), 1)
+        self.assertEqual(validator_cost(required), 10)
+
+    def test_cheap_validators_run_first(self):
+
+        validator = statevalidator_factory({
+            'description': (self.expensive,),
+            'name': (self.cheap,),
+        })()
+
+        self.assertFalse(validator.is_valid({}))
+        self.assertEqual(self.calls, ['cheap'])
+
+    def test_errors_run_every_validator(self):
+
+        validator = statevalidator_factory({
+            'description': (self.expensive,),
+            'name': (self.cheap,),
+        })()
+
+        self.assertEqual(
+            sorted(validator.errors({})),
+            ['description', 'name'],
+        )
+
+    def test_states_valid_orders_checks_across_states(self):
+
+        validators = {
+            'draft': statevalidator_factory({
+                'description': (self.expensive,),
+            })(),
+            'published': statevalidator_factory({
+                'name': (self.cheap,),
+            })(),
+        }
+
+        self.assertFalse(states_valid(validators, {}))
+        self.assertEqual(self.calls, ['cheap'])
+
+    def test_measured_costs_take_precedence(self):
+
+        TestValidator = statevalidator_factory({
+            'description': (self.expensive,),
+            'name': (self.cheap,),
+        })
+
+        costs = TestValidator.measure_costs([{'name': 'Joe'}] * 3)
+        self.calls = []
+
+        self.assertEqual(
+            sorted(costs),
+            [('description', 0), ('name', 0)],
+        )
+
+        TestValidator.costs = {('description', 0): 0, ('name', 0): 5}
+        self.assertFalse(TestValidator().is_valid({}))
+        self.assertEqual(self.calls, ['expensive'])
+
+
+class RevalidateStatesTests(TestCase):
+
+    def setUp(self):
+
+        def counting_required(value):
+            counting_required.num_calls += 1
+            required(value)
+        counting_required.num_calls = 0
+        self.counting_required = counting_required
+
+        self.validators = {
+            'draft': statevalidator_factory({
+                'first_name': (required,),
+            })(),
+            'published': statevalidator_factory({
+                'first_name': (required,),
+                'last_name': (counting_required,),
+            })(),
+        }
+
+    def test_field_index(self):
+
+        self.assertEqual(
+            field_index(self.validators),
+            {
+                'first_name': frozenset(['draft', 'published']),
+                'last_name': frozenset(['published']),
+            },
+        )
+
+    def test_only_changed_fields_revalidated(self):
+
+        previous = validate_states(self.validators, {})
+        self.counting_required.num_calls = 0
+
+        errors = revalidate_states(
+            self.validators,
+            {'first_name': 'Joe'},
+            previous,
+            ['first_name'],
+        )
+
+        self.assertEqual(self.counting_required.num_calls, 0)
+        self.assertEqual(errors['draft'], {})
+        self.assertEqual(
+            errors['published'],
+            {'last_name': ['This field is required']},
+        )
+
+    def test_unaffected_states_reuse_errors(self):
+
+        previous = validate_states(self.validators, {})
+
+        errors = revalidate_states(
+            self.validators,
+            {'last_name': 'Smith'},
+            previous,
+            ['last_name'],
+        )
+
+        self.assertIs(errors['draft'], previous['draft'])
+        self.assertEqual(
+            errors['published'],
+            {'first_name': ['This field is required']},
+        )
+
+    def test_formset_forms_revalidated(self):
+
+        NameFormSet = formset_factory(NameForm, extra=0)
+        formset = NameFormSet(
+            initial=[
+                {'first_name': 'Joe'},
+                {'first_name': 'Jane', 'last_name': 'Smith'},
+            ],
+        )
+        previous = validate_states(self.validators, formset)
+
+        formset.forms[0].initial['last_name'] = 'Doe'
+        errors = revalidate_states(
+            self.validators,
+            formset,
+            previous,
+            ['last_name'],
+        )
+
+        self.assertIs(errors['draft'], previous['draft'])
+        self.assertEqual(errors['published'], [{}, {}])
+
+    def test_formset_errors_must_match_forms(self):
+
+        formset = formset_factory(NameForm, extra=0)(
+            initial=[{'first_name': 'Joe'}],
+        )
+
+        with self.assertRaises(ValueError):
+            self.validators['published'].revalidate(
+                formset, [{}, {}], ['last_name'],
+            )
+
+
+class StateLadderTests(TestCase):
+
+    def setUp(self):
+
+        def counting_required(value):
+            counting_required.num_calls += 1
+            required(value)
+        counting_required.num_calls = 0
+        self.counting_required = counting_required
+
+        self.states = (
+            ('draft', {'name': (counting_required,)}),
+            ('ready', statevalidator_factory({
+                'name': (counting_required,),
+                'venue': (required,),
+            })),
+            ('published', {'venue': (required,), 'date': (required,)}),
+        )
+
+    def test_mask(self):
+
+        ladder = StateLadder(self.states)
+
+        self.assertEqual(ladder.mask('draft'), 1)
+        self.assertEqual(ladder.mask('draft', 'published'), 5)
+        self.assertEqual(ladder.states_in(6), ['ready', 'published'])
+
+    def test_satisfied_returns_mask(self):
+
+        ladder = StateLadder(self.states)
+
+        self.assertEqual(ladder.satisfied({}), 0)
+        self.assertEqual(ladder.satisfied({'name': 'Party'}), 1)
+        self.assertEqual(
+            ladder.satisfied({'venue': 'Home', 'date': 'Today'}),
+            ladder.mask('published'),
+        )
+        self.assertEqual(
+            ladder.satisfied({'name': 'Party', 'venue': 'Home',
+                              'date': 'Today'}),
+            7,
+        )
+
+    def test_satisfied_shares_validator_results(self):
+
+        ladder = StateLadder(self.states)
+        ladder.satisfied({'name': 'Party'})
+
+        self.assertEqual(self.counting_required.num_calls, 1)
+
+    def test_highest(self):
+
+        ladder = StateLadder(self.states)
+
+        self.assertEqual(ladder.highest({}), None)
+        self.assertEqual(
+            ladder.highest({'name': 'Party', 'venue': 'Home'}),
+            'ready',
+        )
+        self.assertEqual(
+            ladder.highest({'venue': 'Home', 'date': 'Today'}),
+            'published',
+        )
+
+    def test_monotonic_stops_at_first_failure(self):
+
+        ladder = StateLadder(self.states, monotonic=True)
+
+        self.assertEqual(ladder.satisfied({'venue': 'Home',
+                                           'date': 'Today'}), 0)
+        self.assertEqual(self.counting_required.num_calls, 1)
+        self.assertEqual(
+            ladder.highest({'name': 'Party', 'date': 'Today'}),
+            'draft',
+        )
+
+    def test_disabled_states_satisfied(self):
+
+        ladder = StateLadder(self.states)
+        ladder.validators[1][1].disable()
+
+        self.assertEqual(ladder.satisfied({'name': 'Party'}), 3)
+
+    def test_formset_satisfies_states_of_all_forms(self):
+
+        ladder = StateLadder((
+            ('named', {'first_name': (required,)}),
+            ('complete', {'last_name': (required,)}),
+        ))
+        NameFormSet = formset_factory(NameForm, extra=0)
+
+        formset = NameFormSet(
+            initial=[
+                {'first_name': 'Joe', 'last_name': 'Smith'},
+                {'first_name': 'Jane'},
+            ],
+        )
+
+        self.assertEqual(ladder.highest(formset), 'named')
+
+
+class StateValidatedNameForm(StateValidatorFormMixin, NameForm):
+
+    state_validators = {
+        'draft': {
+            'first_name': (required,),
+        },
+        'published': statevalidator_factory({
+            'last_name': (required,),
+        }),
+    }
+
+
+class StateValidatorFormMixinTests(TestCase):
+
+    def test_dict_specs_build_one_class(self):
+
+        form1 = StateValidatedNameForm()
+        form2 = StateValidatedNameForm()
+
+        self.assertIs(
+            type(form1.state_validators['draft']),
+            type(form2.state_validators['draft']),
+        )
+
+    def test_validators_not_rebuilt_per_instance(self):
+
+        StateValidatedNameForm()
+
+        with patch.object(
+                StateValidatedNameForm, '_make_validator') as make_validator:
+            StateValidatedNameForm()
+
+        self.assertFalse(make_validator.called)
+
+    def test_compiled_validators_shared_by_instances(self):
+
+        form1 = StateValidatedNameForm(data={})
+        form2 = StateValidatedNameForm(data={})
+
+        self.assertIs(
+            form1.state_validators['published']._get_checks(),
+            form2.state_validators['published']._get_checks(),
+        )
+
+    def test_disable_only_affects_instance(self):
+
+        form1 = StateValidatedNameForm(data={})
+        form2 = StateValidatedNameForm(data={})
+
+        form1.disable_state('published')
+
+        self.assertTrue(form1.is_valid('published'))
+        self.assertEqual(form1.get_errors('published'), {})
+        self.assertFalse(form1.state_enabled('published'))
+        self.assertFalse(form2.is_valid('published'))
+        self.assertTrue(form2.state_enabled('published'))
+        self.assertTrue(form1.state_validators['published'].enabled)
+
+        form1.enable_state('published')
+        self.assertFalse(form1.is_valid('published'))
+
+    def test_validators_not_copied(self):
+
+        form1 = StateValidatedNameForm(data={})
+        form2 = StateValidatedNameForm(data={})
+
+        self.assertIs(
+            form1.state_validators['published'],
+            form2.state_validators['published'],
+        )
+
+    def test_get_state_errors(self):
+
+        form = StateValidatedNameForm(data={'first_name': 'Joe'})
+
+        self.assertEqual(
+            form.get_state_errors('draft', 'published'),
+            {
+                'draft': {},
+                'published': {'last_name': ['This field is required']},
+            },
+        )
+
+    def test_update_state_errors_uses_changed_data(self):
+
+        form = StateValidatedNameForm(
+            data={
+                'first_name': 'Joe',
+                'initial-first_name': 'Joe',
+                'last_name': 'Smith',
+            },
+            initial={'first_name': 'Joe'},
+        )
+        unbound = StateValidatedNameForm(initial={'first_name': 'Joe'})
+        previous = unbound.get_state_errors('draft', 'published')
+
+        self.assertEqual(form.changed_data, ['last_name'])
+        self.assertEqual(
+            previous['published'],
+            {'last_name': ['This field is required']},
+        )
+        self.assertEqual(
+            form.update_state_errors(previous),
+            {'draft': {}, 'published': {}},
+        )
+
+    def test_is_valid_checks_all_states(self):
+
+        form = StateValidatedNameForm(initial={'first_name': 'Joe'})
+
+        self.assertTrue(form.is_valid('draft'))
+        self.assertFalse(form.is_valid('published'))
+        self.assertFalse(form.is_valid('draft', 'published'))
+
+    def test_changed_state_validators_rebuilt(self):
+
+        class ChangingForm(StateValidatorFormMixin, NameForm):
+            state_validators = {
+                'draft': {'first_name': (required,)},
+            }
+
+        self.assertEqual(
+            list(ChangingForm().state_validators.keys()),
+            ['draft'],
+        )
+
+        ChangingForm.state_validators = {
+            'published': {'last_name': (required,)},
+        }
+
+        self.assertEqual(
+            list(ChangingForm().state_validators.keys()),
+            ['published'],
+        )
+
+
+class RelatedValidationTests(test.TestCase):
+
+    def setUp(self):
+
+        self.hall = Venue.objects.create(address='1 Main St')
+        self.party = Event.objects.create(name='Party', venue=self.hall)
+        self.nowhere = Event.objects.create(name='Nowhere')
+        self.free = Event.objects.create(name='Free', venue=self.hall)
+
+        for price in (10, 20):
+            TicketClass.objects.create(event=self.party, price=price)
+        TicketClass.objects.create(event=self.free, price=0)
+
+        self.validator = statevalidator_factory({
+            'venue__address': (Required(),),
+            'ticket_classes__price': (
+                Required(),
+                Each(validators.MinValueValidator(1)),
+            ),
+        })()
+
+    def test_related_values(self):
+
+        self.assertTrue(self.validator.is_valid(self.party))
+        self.assertEqual(
+            self.validator.errors(self.free),
+            {
+                'ticket_classes__price': [
+                    'Ensure this value is greater than or equal to 1.',
+                ],
+            },
+        )
+        self.assertEqual(
+            sorted(self.validator.errors(self.nowhere)),
+            ['ticket_classes__price', 'venue__address'],
+        )
+
+    def test_each_stops_at_first_failure(self):
+
+        TicketClass.objects.create(event=self.party, price=None)
+        validator = statevalidator_factory({
+            'ticket_classes__price': (
+                Each(Required(), validators.MinValueValidator(1)),
+            ),
+        })()
+
+        self.assertEqual(
+            validator.errors(self.party),
+            {'ticket_classes__price': ['This field is required.']},
+        )
+        self.assertFalse(validator.is_valid(self.party))
+        self.assertFalse(validator.is_valid(self.free))
+
+    def test_to_many_relations_are_lists(self):
+
+        validator = statevalidator_factory({
+            'ticket_classes': (Required(),),
+        })()
+
+        self.assertEqual(
+            validator.errors(self.nowhere),
+            {'ticket_classes': ['This field is required.']},
+        )
+        self.assertTrue(validator.is_valid(self.party))
+        self.assertEqual(
+            set(validator.invalid_pks(Event.objects.all())),
+            set([self.nowhere.pk]),
+        )
+        self.assertEqual(
+            list(dict(validator.validate_queryset(Event.objects.all()))),
+            [self.nowhere.pk],
+        )
+
+    def test_related_lookups(self):
+
+        self.assertEqual(
+            self.validator.related_lookups(Event),
+            (('venue',), ('ticket_classes',)),
+        )
+
+    def test_validate_queryset_prefetches_related_objects(self):
+
+        with self.assertNumQueries(2):
+            results = dict(self.validator.validate_queryset(
+                Event.objects.all(),
+            ))
+
+        self.assertEqual(
+            sorted(results),
+            sorted([self.nowhere.pk, self.free.pk]),
+        )
+
+    def test_to_one_paths_validated_with_values(self):
+
+        validator = statevalidator_factory({
+            'venue__address': (Required(),),
+        })()
+
+        with self.assertNumQueries(1):
+            results = dict(validator.validate_queryset(Event.objects.all()))
+
+        self.assertEqual(list(results), [self.nowhere.pk])
+
+    def test_invalid_pks(self):
+
+        with self.assertNumQueries(3):
+            invalid = set(self.validator.invalid_pks(Event.objects.all()))
+
+        self.assertEqual(invalid, set([self.nowhere.pk, self.free.pk]))
+
+
+class QuerysetValidationTests(test.TestCase):
+
+    def setUp(self):
+
+        self.party = Event.objects.create(name='Party', capacity=10)
+        self.unnamed = Event.objects.create(capacity=20)
+        self.empty = Event.objects.create()
+
+        self.validator = statevalidator_factory({
+            'name': (required,),
+            'capacity': (required,),
+        })()
+
+    def test_yields_invalid_objects(self):
+
+        results = dict(self.validator.validate_queryset(Event.objects.all()))
+
+        self.assertEqual(
+            results,
+            {
+                self.unnamed.pk: {'name': ['This field is required']},
+                self.empty.pk: {
+                    'name': ['This field is required'],
+                    'capacity': ['This field is required'],
+                },
+            },
+        )
+
+    def test_include_valid(self):
+
+        results = dict(self.validator.validate_queryset(
+            Event.objects.all(),
+            include_valid=True,
+        ))
+
+        self.assertEqual(results[self.party.pk], {})
+        self.assertEqual(len(results), 3)
+
+    def test_loads_only_validated_fields(self):
+
+        with self.assertNumQueries(1) as queries:
+            list(self.validator.validate_queryset(Event.objects.all()))
+
+        self.assertFalse('summary' in queries.captured_queries[0]['sql'])
+
+    def test_chunked(self):
+
+        results = list(self.validator.validate_queryset(
+            Event.objects.order_by('pk'),
+            chunk_size=1,
+        ))
+
+        self.assertEqual(
+            [pk for pk, errors in results],
+            [self.unnamed.pk, self.empty.pk],
+        )
+
+    def test_non_field_attributes_validated(self):
+
+        def small(value):
+            if value:
+                raise ValidationError("Too large")
+
+        validator = statevalidator_factory({
+            'is_large': (small,),
+        })()
+        Event.objects.create(capacity=5000)
+
+        self.assertEqual(
+            len(list(validator.validate_queryset(Event.objects.all()))),
+            1,
+        )
+
+    def test_disabled_validator_yields_nothing(self):
+
+        self.validator.disable()
+
+        self.assertEqual(
+            list(self.validator.validate_queryset(Event.objects.all())),
+            [],
+        )
+
+
+class ValidatorFunctionTests(TestCase):
+
+    def test_required(self):
+
+        required = Required()
+
+        required('Joe')
+        required(0)
+        for value in (None, '', [], {}):
+            with self.assertRaises(ValidationError) as raised:
+                required(value)
+            self.assertEqual(raised.exception.code, 'required')
+
+    def test_one_of(self):
+
+        one_of = OneOf(['draft', 'live'])
+
+        one_of('live')
+        with self.assertRaises(ValidationError) as raised:
+            one_of('deleted')
+        self.assertEqual(raised.exception.code, 'invalid_choice')
+
+
+class QueryValidationTests(test.TestCase):
+
+    def setUp(self):
+
+        self.valid = Event.objects.create(
+            name='Party', summary='Fun', capacity=10,
+        )
+        self.unnamed = Event.objects.create(summary='Fun', capacity=10)
+        self.empty = Event.objects.create(name='Empty', capacity=0)
+        self.wordy = Event.objects.create(
+            name='Wordy', summary='Lots of fun', capacity=10,
+        )
+        self.crowded = Event.objects.create(
+            name='Crowded', summary='Fun', capacity=500,
+        )
+
+    def _assert_finds_invalid(self, validator, expected):
+
+        expected = set(obj.pk for obj in expected)
+        self.assertEqual(
+            set(validator.invalid_pks(Event.objects.all())),
+            expected,
+        )
+        self.assertEqual(
+            set(pk for pk, errors in
+                validator.validate_queryset(Event.objects.all())),
+            expected,
+        )
+
+    def test_translated_validators_use_single_query(self):
+
+        validator = statevalidator_factory({
+            'name': (Required(),),
+            'summary': (validators.MaxLengthValidator(5),),
+            'capacity': (
+                Required(),
+                validators.MinValueValidator(1),
+                validators.MaxValueValidator(100),
+            ),
+        })()
+
+        with self.assertNumQueries(1):
+            list(validator.invalid_pks(Event.objects.all()))
+
+        self._assert_finds_invalid(
+            validator,
+            [self.unnamed, self.empty, self.wordy, self.crowded],
+        )
+
+    def test_as_q_returns_untranslated_validators(self):
+
+        validator = statevalidator_factory({
+            'name': (Required(), required),
+        })()
+
+        q, plan = validator.as_q(Event)
+
+        self.assertEqual(
+            set(Event.objects.filter(q)),
+            set([self.unnamed]),
+        )
+        self.assertEqual(plan, (('name', (required,)),))
+
+    def test_untranslated_validators_run_in_python(self):
+
+        def not_empty(value):
+            if value == 'Empty':
+                raise ValidationError("Empty")
+
+        validator = statevalidator_factory({
+            'name': (Required(), not_empty),
+            'capacity': (validators.MinValueValidator(1),),
+        })()
+
+        self._assert_finds_invalid(validator, [self.unnamed, self.empty])
+
+    def test_attributes_which_are_not_fields_run_in_python(self):
+
+        validator = statevalidator_factory({
+            'name': (Required(),),
+            'is_large': (OneOf([True]),),
+        })()
+
+        q, plan = validator.as_q(Event)
+        self.assertEqual([field for field, validators in plan], ['is_large'])
+
+        Event.objects.create(name='Festival', capacity=5000)
+        self._assert_finds_invalid(
+            validator,
+            [self.valid, self.unnamed, self.empty, self.wordy, self.crowded],
+        )
+
+    def test_min_length(self):
+
+        validator = statevalidator_factory({
+            'summary': (validators.MinLengthValidator(4),),
+        })()
+
+        self.assertEqual(
+            set(validator.invalid_pks(Event.objects.all())),
+            set([self.valid.pk, self.unnamed.pk, self.empty.pk,
+                 self.crowded.pk]),
+        )
+
+    def test_one_of(self):
+
+        validator = statevalidator_factory({
+            'name': (OneOf(['Party', 'Wordy']),),
+        })()
+
+        self._assert_finds_invalid(
+            validator,
+            [self.unnamed, self.empty, self.crowded],
+        )
+
+    def test_disabled_validator_finds_nothing(self):
+
+        validator = statevalidator_factory({
+            'name': (Required(),),
+        })()
+        validator.disable()
+
+        self.assertEqual(list(validator.invalid_pks(Event.objects.all())), [])
@@ -0,0 +1,165 @@
+"""Tests for state mask tracking."""
+
+from io import StringIO
+
+from django import test
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from mock import patch
+
+from rebar.tests.models import (
+    Event,
+    TrackedEvent,
+    event_states,
+)
+from rebar.tracking import (
+    StateMaskField,
+    StateTracker,
+    get_tracker,
+)
+from rebar.validators import statevalidator_factory
+
+
+class StateMaskFieldTests(test.SimpleTestCase):
+
+    def test_defaults(self):
+
+        field = StateMaskField()
+
+        self.assertEqual(field.default, 0)
+        self.assertTrue(field.db_index)
+        self.assertFalse(field.editable)
+
+
+class StateTrackerTests(test.TestCase):
+
+    def test_states_computed_on_save(self):
+
+        event = TrackedEvent.objects.create(name='Party')
+        self.assertEqual(event.states, event_states.ladder.mask('draft'))
+
+        event.capacity = 10
+        event.save()
+        self.assertEqual(
+            TrackedEvent.objects.get(pk=event.pk).states,
+            event_states.ladder.mask('draft', 'published'),
+        )
+
+    def test_states_stored_when_saving_other_fields(self):
+
+        event = TrackedEvent.objects.create(name='Party')
+
+        event.capacity = 10
+        event.save(update_fields=['capacity'])
+
+        self.assertEqual(TrackedEvent.objects.get(pk=event.pk).states, 3)
+
+    def test_states_stored_when_saving_deferred_instance(self):
+
+        event = TrackedEvent.objects.create(name='Party', capacity=10)
+
+        event = TrackedEvent.objects.only('name', 'capacity').get()
+        event.name = ''
+        event.save()
+
+        self.assertEqual(TrackedEvent.objects.get(pk=event.pk).states, 0)
+
+    def test_raw_saves_not_tracked(self):
+
+        event = TrackedEvent(name='Party', capacity=10, states=0)
+        event.save_base(raw=True)
+
+        self.assertEqual(TrackedEvent.objects.get(pk=event.pk).states, 0)
+
+    def test_set_states_for_bulk_create(self):
+
+        events = [TrackedEvent(name='Party'), TrackedEvent()]
+        event_states.set_states(events)
+        TrackedEvent.objects.bulk_create(events)
+
+        self.assertEqual(
+            sorted(TrackedEvent.objects.values_list('states', flat=True)),
+            [0, 1],
+        )
+
+    def test_filter_by_states(self):
+
+        draft = TrackedEvent.objects.create(name='Draft')
+        published = TrackedEvent.objects.create(name='Party', capacity=10)
+        TrackedEvent.objects.create()
+
+        self.assertEqual(
+            set(event_states.filter(TrackedEvent.objects.all(), 'draft')),
+            set([draft, published]),
+        )
+        self.assertEqual(
+            list(event_states.filter(TrackedEvent.objects.all(),
+                                     'published')),
+            [published],
+        )
+
+    def test_filter_masks_include_required_states(self):
+
+        tracker = StateTracker(
+            [(str(n), statevalidator_factory({})) for n in range(4)],
+        )
+
+        with patch.object(TrackedEvent.objects, 'filter') as filter:
+            tracker.filter(TrackedEvent.objects, '0', '2')
+
+        [(args, kwargs)] = filter.call_args_list
+        self.assertEqual(
+            sorted(kwargs['states__in']),
+            [0b0101, 0b0111, 0b1101, 0b1111],
+        )
+
+    def test_filter_many_states_compares_bits(self):
+
+        draft = TrackedEvent.objects.create(name='Draft')
+        published = TrackedEvent.objects.create(name='Party', capacity=10)
+
+        with patch('rebar.tracking.MAX_FILTER_MASKS', 1):
+            self.assertEqual(
+                set(event_states.filter(TrackedEvent.objects.all(),
+                                        'draft')),
+                set([draft, published]),
+            )
+
+    def test_update_repairs_stale_masks(self):
+
+        stale = TrackedEvent.objects.create(name='Party', capacity=10)
+        current = TrackedEvent.objects.create(name='Draft')
+        TrackedEvent.objects.filter(pk=stale.pk).update(states=0)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(event_states.update(chunk_size=1), 1)
+
+        self.assertEqual(TrackedEvent.objects.get(pk=stale.pk).states, 3)
+        self.assertEqual(TrackedEvent.objects.get(pk=current.pk).states, 1)
+
+    def test_get_tracker(self):
+
+        self.assertIs(get_tracker(TrackedEvent), event_states)
+
+        with self.assertRaises(LookupError):
+            get_tracker(Event)
+
+
+class UpdateStatesCommandTests(test.TestCase):
+
+    def test_command_updates_states(self):
+
+        event = TrackedEvent.objects.create(name='Party', capacity=10)
+        TrackedEvent.objects.filter(pk=event.pk).update(states=0)
+
+        output = StringIO()
+        call_command('rebar_update_states', 'tests.TrackedEvent',
+                     stdout=output)
+
+        self.assertEqual(TrackedEvent.objects.get(pk=event.pk).states, 3)
+        self.assertTrue('Updated 1 ' in output.getvalue())
+
+    def test_untracked_model_is_an_error(self):
+
+        with self.assertRaises(CommandError):
+            call_command('rebar_update_states', 'tests.Event')
@@ -0,0 +1,208 @@
+"""Store the states a model instance satisfies in an indexed column."""
+
+from django.db import models
+from django.db.models import F
+from django.db.models.signals import (
+    post_save,
+    pre_save,
+)
+
+from rebar.dix import queryset_iterator
+from rebar.validators import (
+    StateLadder,
+    _load_fields,
+)
+
+
+# (model, field name) -> StateTracker
+_trackers = {}
+
+# StateTracker.filter lists the masks to match, using the index, if
+# there are at most this many; otherwise it compares bits of the column.
+MAX_FILTER_MASKS = 64
+
+
+class StateMaskField(models.PositiveIntegerField):
+    """Column holding the bitmask of the states an object satisfies.
+
+    The column is indexed and not editable by default.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        kwargs.setdefault('default', 0)
+        kwargs.setdefault('db_index', True)
+        kwargs.setdefault('editable', False)
+
+        super(StateMaskField, self).__init__(*args, **kwargs)
+
+
+class StateTracker(object):
+    """Keep a StateMaskField in sync with the states of a model.
+
+    ``states`` is a StateLadder, or a sequence of ``(state,
+    validator)`` pairs to build one from. Once connected to a model,
+    the mask is recomputed whenever an instance is saved.
+
+    """
+
+    def __init__(self, states, field_name='states'):
+
+        if not isinstance(states, StateLadder):
+            states = StateLadder(states)
+
+        self.ladder = states
+        self.field_name = field_name
+        self.model = None
+
+    def connect(self, model):
+        """Recompute the mask of instances of model before they're saved."""
+
+        self.model = model
+        _trackers[(model, self.field_name)] = self
+
+        dispatch_uid = 'rebar.tracking.%s.%s.%s' % (
+            model._meta.app_label,
+            model._meta.object_name,
+            self.field_name,
+        )
+        pre_save.connect(
+            self._pre_save,
+            sender=model,
+            weak=False,
+            dispatch_uid=dispatch_uid,
+        )
+        post_save.connect(
+            self._post_save,
+            sender=model,
+            weak=False,
+            dispatch_uid=dispatch_uid,
+        )
+
+        return self
+
+    def _pre_save(self, sender, instance, raw=False, **kwargs):
+
+        # fixtures are loaded as they are
+        if not raw:
+            self.set_states([instance])
+
+    def _post_save(self, sender, instance, raw=False, update_fields=None,
+                   **kwargs):
+
+        # saving with update_fields (or a deferred mask) doesn't write
+        # the recomputed mask, so store it separately
+        if (not raw and
+                update_fields is not None and
+                self.field_name not in update_fields):
+            sender._base_manager.using(kwargs.get('using')).filter(
+                pk=instance.pk,
+            ).update(**{self.field_name: getattr(instance, self.field_name)})
+
+    def set_states(self, objs):
+        """Set the mask on each of objs, without saving them.
+
+        Use this before ``bulk_create``, which does not send
+        ``pre_save``.
+
+        """
+
+        for obj in objs:
+            setattr(obj, self.field_name, self.ladder.satisfied(obj))
+
+    def update(self, queryset=None, chunk_size=500):
+        """Recompute and store the mask for each object in queryset.
+
+        Objects are loaded ``chunk_size`` at a time, and only rows
+        whose mask changed are written, with one UPDATE for each
+        distinct mask in a chunk. Returns the number of rows updated.
+
+        """
+
+        if queryset is None:
+            queryset = self.model._default_manager.all()
+
+        fields = set(
+            field
+            for state, validator in self.ladder.validators
+            for field, _ in validator._get_plan()
+        )
+        queryset = _load_fields(queryset, fields, self.field_name)
+
+        updated = 0
+        chunk = []
+
+        for obj in queryset_iterator(queryset.order_by('pk'), chunk_size):
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                updated += self._update_chunk(queryset, chunk)
+                chunk = []
+
+        if chunk:
+            updated += self._update_chunk(queryset, chunk)
+
+        return updated
+
+    def _update_chunk(self, queryset, objs):
+
+        changed = {}
+        for obj in objs:
+            mask = self.ladder.satisfied(obj)
+            if mask != getattr(obj, self.field_name):
+                changed.setdefault(mask, []).append(obj.pk)
+
+        # update through the base manager, on the queryset's database, so
+        # a default manager which filters rows doesn't skip any
+        manager = queryset.model._base_manager.using(queryset.db)
+
+        updated = 0
+        for mask, pks in changed.items():
+            updated += manager.filter(
+                pk__in=pks,
+            ).update(**{self.field_name: mask})
+
+        return updated
+
+    def filter(self, queryset, *states):
+        """Return the objects in queryset which satisfy all of states.
+
+        This is expressed as an ``IN`` lookup on the masks which
+        include states, so the column's index can be used. If there are
+        more than ``MAX_FILTER_MASKS`` of them, the bits of the column
+        are compared instead.
+
+        """
+
+        required = self.ladder.mask(*states)
+        others = ((1 << len(self.ladder.states)) - 1) & ~required
+
+        if 1 << bin(others).count('1') > MAX_FILTER_MASKS:
+            alias = '_%s_required' % (self.field_name,)
+            return queryset.annotate(**{
+                alias: F(self.field_name).bitand(required),
+            }).filter(**{alias: required})
+
+        # every combination of the other states' bits
+        masks = []
+        subset = others
+        while True:
+            masks.append(required | subset)
+            if not subset:
+                break
+            subset = (subset - 1) & others
+
+        return queryset.filter(**{'%s__in' % self.field_name: masks})
+
+
+def get_tracker(model, field_name='states'):
+    """Return the StateTracker connected to field_name of model."""
+
+    try:
+        return _trackers[(model, field_name)]
+    except KeyError:
+        raise LookupError(
+            "No StateTracker is connected to %s.%s." % (
+                model._meta.object_name, field_name,
+            ),
+        )
@@ -1,9 +1,48 @@
-from copy import deepcopy
+import threading
+import types
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
 
-from django.core.exceptions import ValidationError
+from django.core import validators as django_validators
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import models
+from django.db.models import Q
 from django.forms import forms, formsets
-from rebar.dix import ErrorList
+from rebar import instrumentation
+from rebar.dix import (
+    BaseManager,
+    ContextVar,
+    ErrorList,
+    FieldDoesNotExist,
+    Mapping,
+    error_list,
+    gettext_lazy as _,
+    is_relation,
+    is_to_many,
+    perf_counter,
+    queryset_iterator,
+    related_model,
+)
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Weak references to the StateValidators disabled in the current
+# context.
+_disabled = ContextVar('rebar_disabled_validators', default=frozenset())
+
+# The maximum number of validator classes built from dicts of field
+# validators which are kept for reuse.
+CLASS_CACHE_SIZE = 256
+
+# The estimated cost, in microseconds, of calling a validation function
+# which does not declare a ``cost``.
+DEFAULT_COST = 10
 
 
 class StateValidatorFormMixin(object):
@@ -16,28 +55,73 @@ class StateValidatorFormMixin(object):
 
     def __init__(self, *args, **kwargs):
 
-        # Make a copy of the state validators so mutating them for one
-        # for instance does not impact other instances.
-        self.state_validators = deepcopy(self.__class__.state_validators)
-
-        self.state_validators = dict([
-            (state, self._make_validator(state, validator))
-             for state, validator in self.__class__.state_validators.items()
-            ])
+        # The validators are built once per class and shared by its
+        # instances; states are disabled for one instance by adding
+        # them to disabled_states.
+        self.state_validators = dict(self._get_state_validators())
+        self.disabled_states = set()
         return super(StateValidatorFormMixin, self).__init__(*args, **kwargs)
 
-    def _make_validator(self, state, validator):
+    def disable_state(self, state):
+        """Disable the validator of state for this form only."""
+
+        self.disabled_states.add(state)
+
+    def enable_state(self, state):
+        """Enable the validator of state for this form."""
+
+        self.disabled_states.discard(state)
+
+    def state_enabled(self, state):
+        """Return True if the validator of state is enabled for this form."""
+
+        return state not in self.disabled_states and \
+            self.state_validators[state].enabled
+
+    def _disabled_context(self):
+        """Return a context manager disabling the disabled states."""
+
+        return _disabling(
+            self.state_validators[state] for state in self.disabled_states
+        )
 
-        if isinstance(validator, type):
-            # need to instantiate the state validator
-            return validator()
-        elif isinstance(validator, dict):
-            return type('%sValidator' % state,
-                        (StateValidator,),
-                        {'validators': validator})()
+    @classmethod
+    def _get_state_validators(cls):
+        """Return the StateValidator instance for each state of cls."""
 
-        # must already be an instantiated instance, just make a copy
-        return deepcopy(validator)
+        compiled = cls.__dict__.get('_compiled_state_validators')
+
+        if compiled is None or compiled[0] is not cls.state_validators:
+            compiled = (
+                cls.state_validators,
+                dict(
+                    (state, cls._make_validator(state, validator))
+                    for state, validator in cls.state_validators.items()
+                ),
+            )
+            cls._compiled_state_validators = compiled
+
+        return compiled[1]
+
+    @classmethod
+    def _get_state_field_index(cls):
+        """Return a dict of field name to the states validating it."""
+
+        index = cls.__dict__.get('_state_field_index')
+
+        if index is None or index[0] is not cls.state_validators:
+            index = (
+                cls.state_validators,
+                field_index(cls._get_state_validators()),
+            )
+            cls._state_field_index = index
+
+        return index[1]
+
+    @classmethod
+    def _make_validator(cls, state, validator):
+
+        return _make_validator(state, validator)
 
     def is_valid(self, *states):
         """Returns True if no errors are thrown for the specified state."""
@@ -46,13 +130,76 @@ class StateValidatorFormMixin(object):
         if not states:
             return super(StateValidatorFormMixin, self).is_valid()
 
-        return all(self.state_validators[state].is_valid(self)
-                   for state in states)
+        with self._disabled_context():
+            return states_valid(
+                dict(
+                    (state, self.state_validators[state]) for state in states
+                ),
+                self,
+            )
 
     def get_errors(self, state):
         """Return any validation errors raised for the specified state."""
 
-        return self.state_validators[state].errors(self)
+        with self._disabled_context():
+            return self.state_validators[state].errors(self)
+
+    def get_state_errors(self, *states):
+        """Return a dict of state to validation errors for each state.
+
+        The states are validated in a single pass, so a validation
+        function shared by several states is only called once for each
+        field.
+
+        """
+
+        with self._disabled_context():
+            return validate_states(
+                dict(
+                    (state, self.state_validators[state]) for state in states
+                ),
+                self,
+            )
+
+    def update_state_errors(self, previous, changed=None):
+        """Return updated state errors after some fields have changed.
+
+        previous is a dict of state to errors, as returned by
+        ``get_state_errors``. Only the validators of the ``changed``
+        fields (by default, the form's ``changed_data``) are run again;
+        the errors of states which don't validate those fields are
+        reused as they are.
+
+        """
+
+        if changed is None:
+            changed = self.changed_data
+
+        with self._disabled_context():
+            return revalidate_states(
+                dict(
+                    (state, self.state_validators[state])
+                    for state in previous
+                ),
+                self,
+                previous,
+                changed,
+                index=self._get_state_field_index(),
+            )
+
+
+class _class_or_instance_method(object):
+    """Method bound to the instance, or to the class if called on it."""
+
+    def __init__(self, function):
+        self.function = function
+        self.__doc__ = function.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return types.MethodType(self.function, owner)
+
+        return types.MethodType(self.function, instance)
 
 
 class StateValidator(object):
@@ -60,22 +207,47 @@ class StateValidator(object):
 
     validators = {}
 
-    def __init__(self):
-        self._enabled = True
+    # The state this validator checks, if known; set for the validators
+    # built for a state by StateValidatorFormMixin and StateLadder.
+    state = None
+
+    # Measured cost of each validation function, in microseconds, keyed
+    # by (field, position); see measure_costs().
+    costs = None
 
     @property
     def enabled(self):
-        return self._enabled
+        return weakref.ref(self) not in _disabled.get()
 
     def disable(self):
-        """Disable the validator; when disabled, no errors will be returned."""
+        """Disable the validator; when disabled, no errors will be returned.
+
+        Only the current context (the current thread, or asyncio task)
+        is affected, until ``enable()`` is called.
 
-        self._enabled = False
+        """
+
+        _disabled.set(_live_refs(_disabled.get()) | frozenset([
+            weakref.ref(self),
+        ]))
 
     def enable(self):
-        """Enable the validators."""
+        """Enable the validators in the current context."""
+
+        _disabled.set(_live_refs(_disabled.get()) - frozenset([
+            weakref.ref(self),
+        ]))
+
+    @contextmanager
+    def disabled(self):
+        """Disable the validator in the current context for a block.
+
+        The validator is enabled again when the block exits.
+
+        """
 
-        self._enabled = True
+        with _disabling([self]):
+            yield self
 
     def is_valid(self, instance):
         """Return True if no errors are raised when validating instance.
@@ -83,33 +255,166 @@ class StateValidator(object):
         instance can be a dict (ie, form.cleaned_data), a form, or a
         model instance. If instance is a form, full_clean() will be
         called.
+
+        Validation stops at the first validation function which fails,
+        and no errors are collected; use ``errors`` to get every error.
+        Subclasses which override ``errors`` are valid if it returns no
+        errors.
+        """
+
+        if _overrides_errors(self):
+            return not _has_errors(self.errors(instance))
+
+        if isinstance(instance, formsets.BaseFormSet):
+            return all(self.is_valid(f) for f in _formset_forms(instance))
+
+        get = _value_getter(instance)
+        return get is None or self._passes(get)
+
+    @classmethod
+    def compile(cls):
+        """Return the validation plan for this class.
+
+        The plan is a tuple of ``(field, validators)`` pairs, in the
+        order of ``validators``. It is built the first time the class
+        validates anything and reused after that; replacing
+        ``validators`` causes it to be rebuilt, but the ``validators``
+        dict should not be modified in place after first use.
+
+        """
+
+        # the plan is kept on the class defining validators, so
+        # subclasses which don't replace them share it
+        owner = next(c for c in cls.__mro__ if 'validators' in c.__dict__)
+        compiled = owner.__dict__.get('_compiled_plan')
+
+        if compiled is None or compiled[0] is not owner.validators:
+            compiled = (owner.validators, _compile_plan(owner.validators))
+            owner._compiled_plan = compiled
+
+        return compiled[1]
+
+    @_class_or_instance_method
+    def measure_costs(self, instances):
+        """Measure the cost of each validation function on instances.
+
+        Every validation function is timed on each of the sample
+        instances, and the mean cost is stored in ``costs``, where it
+        takes precedence over declared costs. Returns ``costs``.
+
+        This may be called on a class, or on an instance to keep the
+        costs to that instance; classes returned by
+        ``statevalidator_factory`` are shared by every caller with the
+        same validators, so their costs should be measured on an
+        instance.
+
         """
 
-        errors = self.errors(instance)
+        if isinstance(self, StateValidator):
+            plan = self._get_plan()
+        else:
+            plan = self.compile()
+
+        totals = {}
+        count = 0
+
+        for instance in instances:
+            get = _value_getter(instance)
+            if get is None:
+                continue
+
+            count += 1
+            for field, validators in plan:
+                value = get(field)
+                for position, validator in enumerate(validators):
+                    start = perf_counter()
+                    _run_validator(validator, value)
+                    elapsed = perf_counter() - start
+
+                    key = (field, position)
+                    totals[key] = totals.get(key, 0) + elapsed
 
-        if isinstance(errors, list):
-            return not any(errors)
+        if count:
+            self.costs = dict(
+                (key, total * 1000000 / count)
+                for key, total in totals.items()
+            )
 
-        return not bool(errors)
+        return self.costs
+
+    def _get_plan(self):
+
+        if 'validators' in self.__dict__:
+            # validators were set on this instance
+            return _compile_plan(self.validators)
+
+        return self.compile()
+
+    def _get_checks(self):
+        """Return the (cost, field, validator) checks, cheapest first."""
+
+        plan = self._get_plan()
+        costs = self.costs
+        compiled = getattr(self, '_compiled_checks', None)
+
+        if compiled is None or \
+                compiled[0] is not plan or compiled[1] is not costs:
+            compiled = (plan, costs, _order_checks(plan, costs))
+            if 'costs' in self.__dict__:
+                # costs were measured on this instance
+                self._compiled_checks = compiled
+            elif 'validators' not in self.__dict__:
+                type(self)._compiled_checks = compiled
+
+        return compiled[2]
 
     def _validate(self, data):
         """Helper to run validators on the field data."""
 
+        return self._check(data.get)
+
+    def _check(self, get, results=None, plan=None):
+        """Run the validators on the values returned by get(field).
+
+        If a ``results`` dict is provided, it is used to share the
+        outcome of each (field, validator) pair with other validators
+        checking the same values. ``plan`` may be used to run a subset
+        of the validation plan.
+
+        """
+
         errors = {}
 
         # if the validator is not enabled, return the empty error dict
-        if not self._enabled:
+        if not self.enabled:
             return errors
 
-        for field in self.validators:
+        if plan is None:
+            plan = self._get_plan()
+
+        for field, validators in plan:
 
-            field_errors = []
+            value = get(field)
+            field_errors = None
 
-            for validator in self.validators[field]:
-                try:
-                    validator(data.get(field, None))
-                except ValidationError as e:
-                    field_errors += e.messages
+            for validator in validators:
+                if results is None:
+                    validator_errors = _run_validator(
+                        validator, value, self, field,
+                    )
+                else:
+                    key = (field, id(validator))
+                    try:
+                        validator_errors = results[key]
+                    except KeyError:
+                        validator_errors = results[key] = _run_validator(
+                            validator, value, self, field,
+                        )
+
+                if validator_errors:
+                    if field_errors is None:
+                        field_errors = []
+                    field_errors += validator_errors
 
             # if there were errors, cast to ErrorList for output convenience
             if field_errors:
@@ -117,12 +422,33 @@ class StateValidator(object):
 
         return errors
 
+    def _passes(self, get, results=None, plan=None):
+        """Return True if the values returned by get(field) are valid.
+
+        Validation functions are called from the cheapest to the most
+        expensive, and False is returned as soon as one fails. If a
+        ``results`` dict is provided, it is used to share whether each
+        (field, validator) pair passed with other validators.
+
+        """
+
+        if not self.enabled:
+            return True
+
+        if plan is None:
+            checks = self._get_checks()
+        else:
+            checks = _order_checks(plan, None)
+
+        return _run_checks(get, checks, results, self)
+
     def errors(self, instance):
         """Run all field validators and return a dict of errors.
 
         The keys of the resulting dict coorespond to field
-        names. instance can be a dict (ie, form.cleaned_data), a form,
-        a formset, or a model instance.
+        names. instance can be a dict or other mapping (ie,
+        form.cleaned_data or formgroup.cleaned_data), a form, a
+        formset, or a model instance.
 
         If instance is a form, full_clean() will be called if the form
         is bound.
@@ -131,53 +457,1140 @@ class StateValidator(object):
         member form, if bound.
         """
 
-        if isinstance(instance, dict):
-            return self._validate(instance)
+        if isinstance(instance, formsets.BaseFormSet):
+            return self.formset_errors(instance)
 
-        elif isinstance(instance, forms.BaseForm):
-            if instance.is_bound and instance.is_valid():
-                return self._validate(instance.cleaned_data)
+        get = _value_getter(instance)
+        if get is not None:
+            return self._check(get)
 
-            return self._validate(dict(
-                [
-                    (f, instance.initial.get(f, instance[f].value()))
-                    for f in self.validators
-                    ]
-                ))
-
-        elif isinstance(instance, formsets.BaseFormSet):
-            if instance.can_delete:
-                validate_forms = [
-                    form for form in instance.initial_forms
-                    if not instance._should_delete_form(form)
-                    ] + [
-                    form for form in instance.extra_forms
-                    if (form.has_changed() and
-                        not instance._should_delete_form(form))
-                    ]
+    def formset_errors(self, formset, executor=None):
+        """Return a list with the errors of each form of formset.
+
+        Forms which are deleted, and extra forms which have not
+        changed, are skipped; the list of forms to validate is only
+        worked out once for each formset. If an ``executor`` (for
+        example, a ``concurrent.futures.ThreadPoolExecutor``) is
+        provided, the forms are validated with ``executor.map``.
+
+        """
+
+        getters = [_value_getter(form) for form in _formset_forms(formset)]
+
+        if executor is None:
+            return [self._check(get) for get in getters]
+
+        return list(executor.map(self._check, getters))
+
+    def aerrors(self, instance, **kwargs):
+        """Asynchronous version of errors.
+
+        Validation functions may be coroutine functions, which are run
+        concurrently, at most ``concurrency`` at a time (by default,
+        ``rebar.aio.DEFAULT_CONCURRENCY``). See
+        :py:func:`rebar.aio.async_errors`.
+
+        """
+
+        # rebar.aio requires Python 3.5
+        from rebar.aio import async_errors
+
+        return async_errors(self, instance, **kwargs)
+
+    def ais_valid(self, instance, **kwargs):
+        """Asynchronous version of is_valid.
+
+        See :py:func:`rebar.aio.async_is_valid`.
+
+        """
 
-                return [
-                    self.errors(f)
-                    for f in validate_forms
+        from rebar.aio import async_is_valid
+
+        return async_is_valid(self, instance, **kwargs)
+
+    def revalidate(self, instance, errors, changed):
+        """Return the errors of instance after the changed fields changed.
+
+        errors are the previous errors for instance; only the
+        validators of the fields in ``changed`` are run again, and the
+        errors for other fields are reused. If instance is a formset,
+        errors is the list of errors of its forms, as returned by
+        ``errors``, and each form is revalidated in turn.
+
+        """
+
+        if isinstance(instance, formsets.BaseFormSet):
+            forms = _formset_forms(instance)
+            if len(forms) != len(errors):
+                raise ValueError(
+                    "Expected the errors of %d forms, got %d." % (
+                        len(forms), len(errors),
+                    ),
+                )
+
+            return [
+                self.revalidate(form, form_errors, changed)
+                for form, form_errors in zip(forms, errors)
+            ]
+
+        if not self.enabled:
+            return {}
+
+        get = _value_getter(instance)
+        if get is None:
+            return errors
+
+        changed = set(changed)
+        plan = tuple(
+            (field, validators)
+            for field, validators in self._get_plan()
+            if field in changed
+        )
+
+        if not plan:
+            return errors
+
+        updated = dict(
+            (field, field_errors)
+            for field, field_errors in errors.items()
+            if field not in changed
+        )
+        updated.update(self._check(get, plan=plan))
+
+        return updated
+
+    def validate_queryset(self, queryset, chunk_size=2000,
+                          include_valid=False):
+        """Validate every object in queryset, yielding (pk, errors).
+
+        Only the fields named in ``validators`` are loaded: with
+        ``values()`` if they are all non-relational model fields (or
+        paths through to-one relations), and with ``only()`` otherwise.
+        Related objects are loaded as described by
+        ``related_lookups``. Rows are fetched ``chunk_size`` at a time.
+        Only objects with errors are yielded, unless ``include_valid``
+        is True.
+
+        """
+
+        if not self.enabled and not include_valid:
+            return
+
+        for result in self._validate_rows(
+                queryset, self._get_plan(), chunk_size, include_valid):
+            yield result
+
+    def _validate_rows(self, queryset, plan, chunk_size, include_valid):
+
+        fields = [field for field, _ in plan]
+        model_fields = [
+            _model_field(queryset.model, field) for field in fields
+        ]
+
+        if all(f is not None and not is_relation(f) for f in model_fields):
+            rows = (
+                (row['pk'], row.get)
+                for row in queryset_iterator(
+                    queryset.values('pk', *fields), chunk_size,
+                )
+            )
+        else:
+            queryset = _load_fields(queryset, fields)
+
+            rows = (
+                (obj.pk, _value_getter(obj))
+                for obj in queryset_iterator(queryset, chunk_size)
+            )
+
+        for pk, get in rows:
+            errors = self._check(get, plan=plan)
+            if errors or include_valid:
+                yield pk, errors
+
+    def related_lookups(self, model):
+        """Return the related objects to load to validate objects of model.
+
+        Returns a tuple of ``(select_related, prefetch_related)``
+        lookups, worked out from the relations followed by the field
+        names and paths (such as ``venue__address``) in
+        ``validators``.
+
+        """
+
+        return _related_lookups(model, self.fields())
+
+    def prepare_queryset(self, queryset):
+        """Return queryset, loading the related objects that are validated.
+
+        See ``related_lookups``.
+
+        """
+
+        select, prefetch = self.related_lookups(queryset.model)
+
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+
+        return queryset
+
+    def fields(self):
+        """Return the names of the validated fields, in validation order."""
+
+        return tuple(field for field, _ in self._get_plan())
+
+    def validate_columns(self, columns):
+        """Validate rows of data given as columns.
+
+        columns is a mapping of field name to a sequence of values (a
+        list, or a NumPy array), one for each row; missing columns are
+        treated as None. Returns a mask for each row, where bit ``n``
+        is set if the ``n`` th field of ``fields()`` is invalid (so 0
+        means the row is valid). The mask is a NumPy array if any column
+        is one, and a list otherwise.
+
+        Validation functions providing ``validate_column(values)``
+        validate a whole column at once; others are called for each
+        value.
+
+        """
+
+        fields = self.fields()
+        lengths = set(len(values) for values in columns.values())
+        if len(lengths) > 1:
+            raise ValueError("Columns must have the same length.")
+        length = lengths.pop() if lengths else 0
+
+        vectorized = numpy is not None and len(fields) < 64 and any(
+            isinstance(values, numpy.ndarray) for values in columns.values()
+        )
+        if vectorized:
+            masks = numpy.zeros(length, dtype=numpy.int64)
+        else:
+            masks = [0] * length
+
+        if not self.enabled:
+            return masks
+
+        for bit, (field, validators) in enumerate(self._get_plan()):
+            values = columns.get(field)
+            if values is None:
+                values = [None] * length
+
+            failed = None
+            for validator in validators:
+                invalid = _validator_column(validator, values)
+                if invalid is None:
+                    invalid = [
+                        _run_validator(validator, value) is not None
+                        for value in values
                     ]
+
+                if vectorized:
+                    invalid = numpy.asarray(invalid, dtype=bool)
+                    failed = invalid if failed is None else failed | invalid
+                elif failed is None:
+                    failed = list(invalid)
+                else:
+                    failed = [a or b for a, b in zip(failed, invalid)]
+
+            if failed is None:
+                continue
+
+            if vectorized:
+                masks |= failed.astype(numpy.int64) << bit
             else:
-                validate_forms = instance.initial_forms + [
-                    form for form in instance.extra_forms
-                    if form.has_changed()
-                    ]
-                return [self.errors(f) for f in validate_forms]
+                for row, row_failed in enumerate(failed):
+                    if row_failed:
+                        masks[row] |= 1 << bit
+
+        return masks
+
+    def as_q(self, model):
+        """Return a Q object matching the invalid objects of model.
+
+        Returns a tuple of ``(q, plan)``: ``q`` matches the objects
+        which fail the validators that can be expressed as a query (or
+        is None if there are none), and ``plan`` contains the
+        validators which can not, as ``(field, validators)`` pairs.
+
+        """
+
+        q = None
+        plan = []
+
+        for field, validators in self._get_plan():
+            model_field = _model_field(model, field)
+            remaining = []
+
+            if model_field is None:
+                # attributes which aren't fields, and paths through
+                # to-many relations (validated as lists of values),
+                # can not be expressed as a query
+                plan.append((field, validators))
+                continue
+
+            for validator in validators:
+                validator_q = _validator_q(validator, field, model_field)
+                if validator_q is None:
+                    remaining.append(validator)
+                elif q is None:
+                    q = validator_q
+                else:
+                    q |= validator_q
+
+            if remaining:
+                plan.append((field, tuple(remaining)))
+
+        return q, tuple(plan)
+
+    def invalid_pks(self, queryset, chunk_size=2000):
+        """Yield the primary key of each invalid object in queryset.
+
+        Validators which can be expressed as a query (see ``as_q``)
+        are checked by the database; if all of them can be, this is a
+        single query. The objects which pass the query are then
+        validated in Python with the remaining validators.
+
+        """
+
+        if not self.enabled:
+            return
+
+        q, plan = self.as_q(queryset.model)
+
+        if q is not None:
+            for pk in queryset_iterator(
+                    queryset.filter(q).values_list('pk', flat=True),
+                    chunk_size):
+                yield pk
+
+            queryset = queryset.exclude(q)
+
+        if plan:
+            for pk, errors in self._validate_rows(
+                    queryset, plan, chunk_size, False):
+                yield pk
+
+
+class Required(object):
+    """Validation function which requires a non-empty value."""
+
+    message = _('This field is required.')
+    code = 'required'
+    cost = 1
+
+    def __call__(self, value):
+
+        if value in django_validators.EMPTY_VALUES:
+            raise ValidationError(self.message, code=self.code)
+
+    def validate_column(self, values):
+
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            if values.dtype.kind in 'biu':
+                return numpy.zeros(len(values), dtype=bool)
+            elif values.dtype.kind == 'f':
+                return numpy.isnan(values)
+            elif values.dtype.kind in 'SU':
+                return values == values.dtype.type()
+
+        return [value in django_validators.EMPTY_VALUES for value in values]
+
+    def as_q(self, name, field):
+
+        q = Q(**{'%s__isnull' % name: True})
+        if field is not None and field.empty_strings_allowed:
+            q |= Q(**{name: ''})
+
+        return q
+
+
+class OneOf(object):
+    """Validation function which requires a value to be one of choices."""
+
+    message = _('Select a valid choice. %(value)s is not one of the '
+                'available choices.')
+    code = 'invalid_choice'
+    cost = 1
+
+    def __init__(self, choices):
+
+        self.choices = tuple(choices)
+
+    def __call__(self, value):
+
+        if value not in self.choices:
+            raise ValidationError(
+                self.message,
+                code=self.code,
+                params={'value': value},
+            )
+
+    def validate_column(self, values):
+
+        if numpy is not None and isinstance(values, numpy.ndarray) and \
+                values.dtype.kind != 'O':
+            return ~numpy.isin(values, self.choices)
+
+        return [value not in self.choices for value in values]
+
+    def as_q(self, name, field):
+
+        if None in self.choices:
+            return None
+
+        return (
+            ~Q(**{'%s__in' % name: self.choices}) |
+            Q(**{'%s__isnull' % name: True})
+        )
+
+
+class Each(object):
+    """Validation function applying validators to each item of a list.
+
+    This is useful for paths through to-many relations (such as
+    ``ticket_classes__price``), whose value is a list with the value
+    for each related object. The validators of an item are called in
+    order, stopping at the first which fails, so ``Required()`` can
+    guard the validators which don't accept None.
+
+    """
+
+    def __init__(self, *validators):
+
+        self.validators = validators
+
+    def __call__(self, values):
 
-        elif isinstance(instance, models.Model):
-            return self._validate(dict(
-                [(f, getattr(instance, f)) for f in self.validators]
-                ))
+        errors = []
+        for value in values or ():
+            for validator in self.validators:
+                failures = _call_validator(validator, value)
+                if failures:
+                    errors.extend(failures)
+                    break
+
+        if errors:
+            raise ValidationError(errors)
+
+
+class StateLadder(object):
+    """An ordered sequence of states, from lowest to highest.
+
+    states is a sequence of ``(state, validator)`` pairs, where each
+    validator may be a StateValidator class or instance, or a dict of
+    field validators. If ``monotonic`` is True, an instance which does
+    not satisfy a state is assumed not to satisfy any higher state, so
+    evaluation stops at the first state which is not satisfied.
+
+    """
+
+    def __init__(self, states, monotonic=False):
+
+        self.validators = tuple(
+            (state, _make_validator(state, validator))
+            for state, validator in states
+        )
+        self.states = tuple(state for state, _ in self.validators)
+        self.monotonic = monotonic
+
+    def mask(self, *states):
+        """Return the bitmask for states."""
+
+        mask = 0
+        for state in states:
+            mask |= 1 << self.states.index(state)
+
+        return mask
+
+    def states_in(self, mask):
+        """Return the states included in mask, from lowest to highest."""
+
+        return [
+            state for bit, state in enumerate(self.states)
+            if mask & (1 << bit)
+        ]
+
+    def satisfied(self, instance):
+        """Return the bitmask of the states instance satisfies.
+
+        Bit ``n`` of the mask is set if instance satisfies the ``n``th
+        state. All states are checked in a single pass, sharing the
+        results of validation functions used by more than one state.
+
+        """
+
+        if isinstance(instance, formsets.BaseFormSet):
+            mask = (1 << len(self.states)) - 1
+            for form in _formset_forms(instance):
+                mask &= self.satisfied(form)
+            return mask
+
+        get = _value_getter(instance)
+        results = {}
+        mask = 0
+
+        for bit, (state, validator) in enumerate(self.validators):
+            if _overrides_errors(validator):
+                passes = validator.is_valid(instance)
+            else:
+                passes = get is None or validator._passes(get, results)
+
+            if not passes:
+                if self.monotonic:
+                    break
+            else:
+                mask |= 1 << bit
+
+        return mask
+
+    def highest(self, instance):
+        """Return the highest state instance satisfies, or None."""
+
+        satisfied = self.states_in(self.satisfied(instance))
+        if satisfied:
+            return satisfied[-1]
+
+
+def validate_states(validators, instance):
+    """Validate instance for several states in a single pass.
+
+    validators is a mapping of state to StateValidator. Returns a dict
+    mapping each state to the result of ``validator.errors(instance)``;
+    each validation function is called only once for each field, even
+    when it is used by more than one state. Validators whose class
+    overrides ``errors`` are validated with it.
+
+    """
+
+    custom = dict(
+        (state, validator) for state, validator in validators.items()
+        if _overrides_errors(validator)
+    )
+    if custom:
+        errors = validate_states(
+            dict(
+                (state, validator)
+                for state, validator in validators.items()
+                if state not in custom
+            ),
+            instance,
+        )
+        errors.update(
+            (state, validator.errors(instance))
+            for state, validator in custom.items()
+        )
+        return errors
+
+    if isinstance(instance, formsets.BaseFormSet):
+        form_errors = [
+            validate_states(validators, form)
+            for form in _formset_forms(instance)
+        ]
+        return dict(
+            (state, [errors[state] for errors in form_errors])
+            for state in validators
+        )
+
+    get = _value_getter(instance)
+    if get is None:
+        return dict((state, None) for state in validators)
+
+    results = {}
+    return dict(
+        (state, validator._check(get, results))
+        for state, validator in validators.items()
+    )
+
+
+def states_valid(validators, instance):
+    """Return True if instance is valid for every state in validators.
+
+    validators is a mapping of state to StateValidator. Validation
+    stops at the first validation function which fails, and the result
+    of each validation function is shared between states.
+
+    """
+
+    custom = [
+        validator for validator in validators.values()
+        if _overrides_errors(validator)
+    ]
+    if custom:
+        return states_valid(
+            dict(
+                (state, validator)
+                for state, validator in validators.items()
+                if validator not in custom
+            ),
+            instance,
+        ) and all(validator.is_valid(instance) for validator in custom)
+
+    if isinstance(instance, formsets.BaseFormSet):
+        return all(
+            states_valid(validators, form)
+            for form in _formset_forms(instance)
+        )
+
+    get = _value_getter(instance)
+    if get is None:
+        return True
+
+    # run the checks of every state from the cheapest to the most
+    # expensive, so an expensive check only runs if every cheaper one
+    # passed
+    checks = sorted(
+        (check + (validator,)
+         for validator in validators.values() if validator.enabled
+         for check in validator._get_checks()),
+        key=_check_cost,
+    )
+
+    return _run_checks(get, checks, {})
+
+
+def field_index(validators):
+    """Return a dict mapping each field to the states which validate it.
+
+    validators is a mapping of state to StateValidator.
+
+    """
+
+    index = {}
+    for state, validator in validators.items():
+        for field, _ in validator._get_plan():
+            index.setdefault(field, set()).add(state)
+
+    return dict(
+        (field, frozenset(states)) for field, states in index.items()
+    )
+
+
+def revalidate_states(validators, instance, previous, changed, index=None):
+    """Return updated errors for each state after fields have changed.
+
+    previous is a dict of state to errors, as returned by
+    ``validate_states``, and changed is the collection of fields which
+    changed since. States whose validators do not read any changed
+    field keep their previous errors; the others re-run only the
+    validators of the changed fields (see
+    :py:meth:`StateValidator.revalidate`). ``index`` may be passed to
+    reuse a precomputed ``field_index(validators)``.
+
+    """
+
+    if index is None:
+        index = field_index(validators)
+
+    affected = set()
+    for field in changed:
+        affected.update(index.get(field, ()))
+
+    return dict(
+        (state,
+         validators[state].revalidate(instance, errors, changed)
+         if state in affected else errors)
+        for state, errors in previous.items()
+    )
+
+
+def validator_cost(validator):
+    """Return the declared cost of a validation function.
+
+    Validation functions may declare their cost, in microseconds, with
+    a ``cost`` attribute; Django's value and length validators are
+    considered cheap, and anything else costs ``DEFAULT_COST``.
+
+    """
+
+    cost = getattr(validator, 'cost', None)
+    if cost is None:
+        cost = _CHEAP_VALIDATORS.get(type(validator), DEFAULT_COST)
+
+    return cost
+
+
+_CHEAP_VALIDATORS = {
+    django_validators.MinValueValidator: 1,
+    django_validators.MaxValueValidator: 1,
+    django_validators.MinLengthValidator: 1,
+    django_validators.MaxLengthValidator: 1,
+}
+
+
+def _order_checks(plan, costs):
+    """Return the (cost, field, validator) checks of plan, cheapest first.
+
+    Measured ``costs`` take precedence over declared costs; checks of
+    the same cost keep the order of the plan.
+
+    """
+
+    checks = []
+    for field, validators in plan:
+        for position, validator in enumerate(validators):
+            if costs is not None and (field, position) in costs:
+                cost = costs[(field, position)]
+            else:
+                cost = validator_cost(validator)
+
+            checks.append((cost, field, validator))
+
+    checks.sort(key=_check_cost)
+
+    return tuple(checks)
+
+
+def _check_cost(check):
+
+    return check[0]
+
+
+def _run_checks(get, checks, results=None, owner=None):
+    """Return True if every check passes, stopping at the first failure.
+
+    owner is the StateValidator the checks belong to; if it is None,
+    each check carries its StateValidator as a fourth item.
+
+    """
+
+    values = {}
+
+    for check in checks:
+        field = check[1]
+        validator = check[2]
+
+        try:
+            value = values[field]
+        except KeyError:
+            value = values[field] = get(field)
+
+        if results is None:
+            passed = _run_validator(
+                validator, value, owner or check[3], field,
+            ) is None
+        else:
+            key = (field, id(validator))
+            try:
+                passed = results[key]
+            except KeyError:
+                passed = results[key] = _run_validator(
+                    validator, value, owner or check[3], field,
+                ) is None
+
+        if not passed:
+            return False
+
+    return True
+
+
+@contextmanager
+def _disabling(validators):
+    """Disable validators in the current context for a block."""
+
+    token = _disabled.set(_disabled.get() | frozenset(
+        weakref.ref(validator) for validator in validators
+    ))
+    try:
+        yield
+    finally:
+        _disabled.reset(token)
+
+
+def _live_refs(refs):
+    """Return the references in refs whose validators still exist."""
+
+    return frozenset(ref for ref in refs if ref() is not None)
+
+
+def _overrides_errors(validator):
+    """Return True if the class of validator overrides errors()."""
+
+    return type(validator).errors != StateValidator.errors
+
+
+def _has_errors(errors):
+
+    if isinstance(errors, list):
+        return any(errors)
+
+    return bool(errors)
+
+
+def _run_validator(validator, value, owner=None, field=None):
+    """Call validator with value, returning the errors raised, if any.
+
+    If instrumentation is enabled, the call is recorded as a call of
+    validator by the StateValidator owner for field.
+
+    """
+
+    sink = instrumentation.sink
+    if sink is not None:
+        return _run_instrumented(sink, validator, value, owner, field)
+
+    return _call_validator(validator, value)
+
+
+def _call_validator(validator, value):
+
+    try:
+        outcome = validator(value)
+    except ValidationError as e:
+        return error_list(e)
+
+    if hasattr(outcome, '__await__'):
+        if hasattr(outcome, 'close'):
+            outcome.close()
+        raise TypeError(
+            "%r is asynchronous; use aerrors() or ais_valid()." % (
+                validator,
+            ),
+        )
+
+
+def _run_instrumented(sink, validator, value, owner, field):
+
+    start = perf_counter()
+    try:
+        errors = _call_validator(validator, value)
+    finally:
+        elapsed = perf_counter() - start
+
+    sink.record(
+        (type(owner) if owner is not None else None,
+         getattr(owner, 'state', None),
+         field,
+         validator),
+        elapsed,
+        errors is not None,
+    )
+
+    return errors
+
+
+def _value_getter(instance):
+    """Return a function which returns the value of a field of instance.
+
+    If instance is a form, its cleaned_data is used if it is bound and
+    valid, otherwise its initial data. Returns None if instance can not
+    be validated.
+
+    """
+
+    if isinstance(instance, Mapping):
+        return instance.get
+
+    elif isinstance(instance, forms.BaseForm):
+        if instance.is_bound and instance.is_valid():
+            return instance.cleaned_data.get
+
+        return lambda f: instance.initial.get(f, instance[f].value())
+
+    elif isinstance(instance, models.Model):
+        return lambda f: _related_value(instance, f)
+
+
+def _related_value(instance, path):
+    """Return the value at the end of a path of relations of instance.
+
+    If the path follows a to-many relation (or is one, such as
+    ``ticket_classes``), a list with the value for each related object
+    is returned. Missing related objects give None.
+
+    """
+
+    values = [instance]
+    to_many = False
+
+    for name in path.split('__'):
+        next_values = []
+
+        for obj in values:
+            if obj is None:
+                next_values.append(None)
+                continue
+
+            try:
+                value = getattr(obj, name)
+            except ObjectDoesNotExist:
+                value = None
+
+            if isinstance(value, BaseManager):
+                to_many = True
+                next_values.extend(value.all())
+            else:
+                next_values.append(value)
+
+        values = next_values
+
+    if to_many:
+        return values
+
+    return values[0]
+
+
+def _validator_q(validator, name, field):
+    """Return a Q object matching values which fail validator, or None."""
+
+    if hasattr(validator, 'as_q'):
+        return validator.as_q(name, field)
+
+    limit = getattr(validator, 'limit_value', None)
+    if limit is None or callable(limit):
+        return None
+
+    if type(validator) is django_validators.MinValueValidator:
+        return Q(**{'%s__lt' % name: limit})
+    elif type(validator) is django_validators.MaxValueValidator:
+        return Q(**{'%s__gt' % name: limit})
+    elif type(validator) is django_validators.MaxLengthValidator:
+        return Q(**{'%s__regex' % name: r'^[\s\S]{%d,}' % (limit + 1,)})
+    elif type(validator) is django_validators.MinLengthValidator:
+        return ~Q(**{'%s__regex' % name: r'^[\s\S]{%d,}' % (limit,)})
+
+
+def _validator_column(validator, values):
+    """Return whether each of values fails validator, or None.
+
+    Returns None if validator can not validate the values at once.
+
+    """
+
+    if hasattr(validator, 'validate_column'):
+        return validator.validate_column(values)
+
+    if type(validator) is django_validators.RegexValidator:
+        return [
+            bool(validator.regex.search(str(value))) ==
+            validator.inverse_match
+            for value in values
+        ]
+
+    if numpy is None or not isinstance(values, numpy.ndarray):
+        return None
+
+    limit = getattr(validator, 'limit_value', None)
+    if limit is None or callable(limit):
+        return None
+
+    if values.dtype.kind in 'iuf':
+        if type(validator) is django_validators.MinValueValidator:
+            return values < limit
+        elif type(validator) is django_validators.MaxValueValidator:
+            return values > limit
+
+    elif values.dtype.kind == 'U':
+        if type(validator) is django_validators.MaxLengthValidator:
+            return numpy.char.str_len(values) > limit
+        elif type(validator) is django_validators.MinLengthValidator:
+            return numpy.char.str_len(values) < limit
+
+
+def _model_field(model, name):
+    """Return the field name of model, or None if it is not a field.
+
+    name may be a path through to-one relations, such as
+    ``venue__address``, in which case the last field is returned.
+    None is also returned for to-many relations, and paths through
+    them, whose values are lists.
+
+    """
+
+    fields = _field_path(model, name)
+    if fields is None or any(is_to_many(f) for f in fields):
+        return None
+
+    return fields[-1]
+
+
+def _field_path(model, name):
+    """Return the fields along a path of field names, or None."""
+
+    fields = []
+
+    for part in name.split('__'):
+        if model is None:
+            return None
+
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+
+        fields.append(field)
+        model = related_model(field) if is_relation(field) else None
+
+    return fields
+
+
+def _related_lookups(model, fields):
+    """Return the (select_related, prefetch_related) lookups for fields."""
+
+    select = []
+    prefetch = []
+
+    for name in fields:
+        path = _field_path(model, name)
+        if path is None:
+            continue
+
+        relations = []
+        to_many = False
+        for part, field in zip(name.split('__'), path):
+            if not is_relation(field):
+                break
+
+            relations.append(part)
+            to_many = to_many or is_to_many(field)
+
+        if relations:
+            lookup = '__'.join(relations)
+            lookups = prefetch if to_many else select
+            if lookup not in lookups:
+                lookups.append(lookup)
+
+    return tuple(select), tuple(prefetch)
+
+
+def _load_fields(queryset, fields, *extra):
+    """Return queryset, loading what's needed to validate fields.
+
+    If fields are all fields of the model, only those (and ``extra``)
+    are loaded; related objects are loaded with ``select_related`` and
+    ``prefetch_related``.
+
+    """
+
+    model = queryset.model
+    if all('__' not in f and _model_field(model, f) is not None
+           for f in fields):
+        queryset = queryset.only(*(extra + tuple(fields)))
+
+    select, prefetch = _related_lookups(model, fields)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+
+    return queryset
+
+
+def _formset_forms(formset):
+    """Return the forms of formset which should be validated.
+
+    The list is computed once and stored on the formset, until the
+    formset is cleaned again.
+
+    """
+
+    cached = formset.__dict__.get('_state_validated_forms')
+    if cached is not None and cached[0] is formset._errors:
+        return cached[1]
+
+    forms = list(formset.initial_forms)
+    for form in formset.extra_forms:
+        if form.has_changed():
+            forms.append(form)
+
+    if formset.can_delete:
+        forms = [
+            form for form in forms
+            if not formset._should_delete_form(form)
+        ]
+
+    formset._state_validated_forms = (formset._errors, forms)
+
+    return forms
+
+
+def _make_validator(state, validator):
+    """Return a StateValidator instance for the validator of state."""
+
+    if isinstance(validator, type):
+        # need to instantiate the state validator
+        validator = validator()
+    elif isinstance(validator, dict):
+        validator = _validator_class(
+            '%sValidator' % state, StateValidator, validator,
+        )()
+    else:
+        # must already be an instantiated instance
+        return validator
+
+    validator.state = state
+    return validator
+
+
+def _compile_plan(validators):
+    """Return a tuple of (field, validators) pairs for a validators dict."""
+
+    return tuple(
+        (field, tuple(field_validators))
+        for field, field_validators in validators.items()
+    )
 
 
 def statevalidator_factory(field_validators, validator=StateValidator):
-    """Return a StateValidator Class with the given validators."""
+    """Return a StateValidator Class with the given validators.
+
+    Classes are cached, so calls with the same validators (in the same
+    order) return the same class; it should not be modified.
+
+    """
+
+    return _validator_class('StateValidator', validator, field_validators)
+
+
+# (name, base class, spec key) -> StateValidator class, least recently
+# used first
+_class_cache = OrderedDict()
+_class_cache_lock = threading.Lock()
+
+
+def _validator_class(name, base, field_validators):
+    """Return a subclass of base with field_validators as validators.
+
+    Classes are kept in a bounded cache, keyed on the fields (in
+    order) and validation functions of field_validators if every
+    validation function is hashable, and on the identity of the dict
+    otherwise.
+
+    """
+
+    spec_key = _spec_key(field_validators)
+    key = (name, base, spec_key)
+
+    with _class_cache_lock:
+        cls = _class_cache.pop(key, None)
+
+        # the class may have been given other validators since
+        if cls is None or \
+                _spec_key(cls.__dict__.get('validators', {})) != spec_key:
+            cls = type(name, (base,), {'validators': field_validators})
+
+        _class_cache[key] = cls
+        while len(_class_cache) > CLASS_CACHE_SIZE:
+            _class_cache.popitem(last=False)
+
+    return cls
+
+
+def _spec_key(field_validators):
 
-    attrs = {
-        'validators': field_validators,
-        }
+    # the order of the fields is the order they're validated in, and
+    # of fields() and validate_columns bits, so it's part of the key
+    key = tuple(
+        (field, tuple(validators))
+        for field, validators in field_validators.items()
+    )
 
-    return type('StateValidator', (validator,), attrs)
+    try:
+        hash(key)
+        return key
+    except TypeError:
+        # the cached class keeps field_validators alive, so its id is
+        # not reused while the class is cached
+        return id(field_validators)